@@ -38,7 +38,7 @@ class Leaderboard(Cog):
         if not isinstance(message.author, discord.Member) or message.author.bot:
             return
         # update member's messages count when receive a message from they
-        MemberWrapper(message.author).message_count_increment()
+        MemberWrapper(message.author, fetch=False).message_count_increment()
 
     @hybrid_command(
         name="leaderboard",
@@ -15,10 +15,13 @@ from sqlalchemy import Result, insert, select, update
 
 import mp2i.database.executor as database_executor
 from mp2i.database.models.pin import PinModel, PinStatus
-from mp2i.utils.discord import has_any_role, has_any_roles_predicate
+from mp2i.utils.discord import has_any_role, has_any_roles_check
 from mp2i.utils.paginator import ComponentsPaginator
 from mp2i.wrappers.guild import GuildWrapper
 
+# built once, the context menu check of every instance is the same
+_PIN_CHECK = has_any_roles_check("Administrateur", "Modérateur", "Gestion Association")
+
 
 class Pin(GroupCog, name="pins", description="Gestion des messages épinglés à faire"):
     """
@@ -41,11 +44,7 @@ class Pin(GroupCog, name="pins", description="Gestion des messages épinglés à
             type=discord.AppCommandType.message,
         )
         ctx_menu.guild_only = True
-        ctx_menu.add_check(
-            lambda interaction: has_any_roles_predicate(
-                interaction, "Administrateur", "Modérateur", "Gestion Association"
-            )
-        )
+        ctx_menu.add_check(_PIN_CHECK)
         bot.tree.add_command(ctx_menu)
 
     async def _add_pin(
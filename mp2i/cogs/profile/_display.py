@@ -1,4 +1,4 @@
-from typing import Iterator, List
+from typing import Dict, Iterator, List
 
 import discord
 import discord.ui as ui
@@ -11,6 +11,12 @@ from mp2i.wrappers.member import MemberWrapper
 
 from ._editor import ProfileEditorView
 
+# heading of the promotions of each type of school, in display order
+_PROMOTION_HEADINGS: Dict[SchoolType, str] = {
+    SchoolType.CPGE: "### CPGE",
+    SchoolType.ECOLE: "### Post-CPGE",
+}
+
 
 class ProfileModifyButton(ui.Button["ProfileView"]):
     """
@@ -109,38 +115,19 @@ class ProfileView(ui.LayoutView):
         if len(member_wrapper.promotions) > 0:
             container.add_item(ui.Separator())
 
-            cpge: List[PromotionModel] = sorted(
-                filter(
-                    lambda prom: prom.school.school_type == SchoolType.CPGE,
-                    member_wrapper.promotions,
-                ),
-                key=lambda prom: (prom.promotion_year or 0, prom.school.school_name),
-            )
-
-            if len(list(cpge)) > 0:
-                container.add_item(ui.TextDisplay("### CPGE"))
-                for promotion in cpge:
-                    container.add_item(
-                        ui.TextDisplay(
-                            f"{promotion.school.school_name}"
-                            + (
-                                f" ({promotion.promotion_year})"
-                                if promotion.promotion_year
-                                else ""
-                            )
-                        )
-                    )
-
-            ecole: List[PromotionModel] = sorted(
-                filter(
-                    lambda prom: prom.school.school_type == SchoolType.ECOLE,
-                    member_wrapper.promotions,
-                ),
+            # promotions are sorted once and split by type of school in one pass
+            by_type: Dict[SchoolType, List[PromotionModel]] = {}
+            for promotion in sorted(
+                member_wrapper.promotions,
                 key=lambda prom: (prom.promotion_year or 0, prom.school.school_name),
-            )
-            if len(list(ecole)) > 0:
-                container.add_item(ui.TextDisplay("### Post-CPGE"))
-                for promotion in ecole:
+            ):
+                by_type.setdefault(promotion.school.school_type, []).append(promotion)
+
+            for school_type, heading in _PROMOTION_HEADINGS.items():
+                if not (promotions := by_type.get(school_type)):
+                    continue
+                container.add_item(ui.TextDisplay(heading))
+                for promotion in promotions:
                     container.add_item(
                         ui.TextDisplay(
                             f"{promotion.school.school_name}"
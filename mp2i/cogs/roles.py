@@ -11,12 +11,15 @@ from sqlalchemy import Result, literal, select
 import mp2i.database.executor as database_executor
 from mp2i.database.models.academy import AcademyModel
 from mp2i.utils.config import get_text_from_static_file
-from mp2i.utils.discord import has_any_roles_predicate
+from mp2i.utils.discord import has_any_roles_check
 from mp2i.utils.email import send_email, verification_code_generator
 from mp2i.wrappers.guild import GuildWrapper
 
 logger: logging.Logger = logging.getLogger(__name__)
 
+# built once, the context menu check of every instance is the same
+_ADMIN_CHECK = has_any_roles_check("Administrateur")
+
 
 @guild_only()
 class Roles(GroupCog, name="roles", description="Gestion des roles"):
@@ -46,9 +49,7 @@ class Roles(GroupCog, name="roles", description="Gestion des roles"):
             type=discord.AppCommandType.message,
         )
         ctx_menu.guild_only = True
-        ctx_menu.add_check(
-            lambda interaction: has_any_roles_predicate(interaction, "Administrateur")
-        )
+        ctx_menu.add_check(_ADMIN_CHECK)
         bot.tree.add_command(ctx_menu)
         # caching roles
         self._roles: dict[int, dict[str, tuple[discord.Role, int]]] = {}
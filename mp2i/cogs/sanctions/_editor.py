@@ -1,13 +1,15 @@
-from typing import Optional
+from typing import Optional, Tuple
 
 import discord
 import discord.ui as ui
-from sqlalchemy import update
+from sqlalchemy import Result, update
 
 import mp2i.database.executor as database_executor
 from mp2i.database.models.sanction import SanctionModel
 from mp2i.wrappers.guild import GuildWrapper
 
+_TITLE: str = "## Modification de sanction"
+
 
 class SanctionEdited(ui.LayoutView):
     def __init__(
@@ -17,15 +19,19 @@ class SanctionEdited(ui.LayoutView):
         staff: Optional[discord.Member] = None,
         dm_sent: bool = True,
     ):
+        super().__init__()
+        # components are bound to the view they are added to, so only the texts
+        # can be shared between the private message and the log
         container: ui.Container = ui.Container()
-        container.add_item(ui.TextDisplay("## Modification de sanction"))
+        container.add_item(ui.TextDisplay(_TITLE))
         container.add_item(
             ui.TextDisplay(
-                f"La sanction d'identifiant `{sanction.sanction_id}` créée le <t:{round(sanction.sanction_date.timestamp())}"
+                f"La sanction d'identifiant `{sanction.sanction_id}` créée le "
+                f"<t:{round(sanction.sanction_date.timestamp())}:f> "
                 + "a vu sa sanction être modifiée"
                 + (
                     (
-                        f"par {staff.mention}"
+                        f" par {staff.mention}"
                         + (" et l'utilisateur a été averti." if dm_sent else ".")
                     )
                     if staff
@@ -34,10 +40,12 @@ class SanctionEdited(ui.LayoutView):
             )
         )
         container.add_item(
-            ui.TextDisplay(f"Ancienne raison :\n```yml{sanction.reason}\n```")
+            ui.TextDisplay(
+                f"Ancienne raison :\n```yml\n{sanction.sanction_reason}\n```"
+            )
         )
         container.add_item(
-            ui.TextDisplay(f"Nouvelle raison :\n```yml{new_reason}\n```")
+            ui.TextDisplay(f"Nouvelle raison :\n```yml\n{new_reason}\n```")
         )
 
         container.accent_colour = sanction.sanction_type.get_colour
@@ -68,6 +76,18 @@ class SanctionEditorModal(ui.Modal):
     async def on_submit(self, interaction: discord.Interaction) -> None:
         if not interaction.guild or not isinstance(interaction.user, discord.Member):
             return
+        # update and check the sanction still exists in a single round-trip
+        result: Optional[Result[Tuple[int]]] = await database_executor.aexecute(
+            update(SanctionModel)
+            .values(sanction_reason=self._reason.value)
+            .where(SanctionModel.sanction_id == self._sanction.sanction_id)
+            .returning(SanctionModel.sanction_id)
+        )
+        if not result or result.scalar_one_or_none() is None:
+            await interaction.response.send_message(
+                "Aucune sanction n'a été trouvé avec cet identifiant.", ephemeral=True
+            )
+            return
         dm_sent: bool = bool(self._dm.values[0])
         member: Optional[discord.Member] = interaction.guild.get_member(
             self._sanction.victim.user_id
@@ -89,11 +109,6 @@ class SanctionEditorModal(ui.Modal):
                     self._sanction, self._reason.value, interaction.user, dm_sent
                 )
             )
-        database_executor.execute(
-            update(SanctionModel)
-            .values(sanction_reason=self._reason.value)
-            .where(SanctionModel.sanction_id == self._sanction.sanction_id)
-        )
         await interaction.response.send_message(
             "Sanction modifiée.",
             allowed_mentions=discord.AllowedMentions.none(),
@@ -1,21 +1,129 @@
+import asyncio
 import datetime
 import logging
-from typing import Optional
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
 import discord
 import discord.ui as ui
 import humanize
-from sqlalchemy import insert
+from sqlalchemy import Result, insert, select
 
 import mp2i.database.executor as database_executor
 from mp2i.database.models.member import MemberModel
 from mp2i.database.models.sanction import SanctionModel, SanctionType
 from mp2i.wrappers.guild import GuildWrapper
-from mp2i.wrappers.member import MemberWrapper
-from mp2i.wrappers.user import UserWrapper
 
 logger: logging.Logger = logging.getLogger(__name__)
 
+_TITLE: str = "## Sanction"
+_DURATION_TEMPLATE: str = "La durée de la sanction est de {duration}"
+_REASON_TEMPLATE: str = "La raison de la sanction est ```yml\n{reason}\n```"
+# texts sent to the victim and to the staff for each type of sanction
+_TEXTS: Dict[SanctionType, Tuple[str, str]] = {
+    SanctionType.WARN: ("Vous avez été averti.", "a été averti."),
+    SanctionType.TIMEOUT: ("Vous avez été rendu muet.", "a été rendu muet."),
+    SanctionType.UNTIMEOUT: ("Vous n'êtes plus muet.", "n'est plus muet."),
+    SanctionType.KICK: ("Vous été expulsé.", "a été expulsé."),
+    SanctionType.BAN: ("Vous avez été banni.", "a été banni."),
+    SanctionType.UNBAN: ("Vous avez été débanni.", "a été débanni."),
+}
+
+# sanctions waiting to be inserted, those arriving during an insert are flushed
+# together with an executemany right after it
+_FLUSH_THRESHOLD: int = 500
+_pending: List[Tuple[Dict[str, Any], "asyncio.Future[Optional[int]]"]] = []
+_flush_task: "Optional[asyncio.Task[None]]" = None
+# built once, so every flush hits SQLAlchemy's compiled statement cache
+_INSERT_SANCTION = insert(SanctionModel).returning(
+    SanctionModel.sanction_id, sort_by_parameter_order=True
+)
+
+
+async def flush_pending_sanctions() -> None:
+    """
+    Insert pending sanctions by batches until none is left, and give back their ids
+    """
+    global _pending
+    while _pending:
+        batch = _pending[:_FLUSH_THRESHOLD]
+        _pending = _pending[_FLUSH_THRESHOLD:]
+        ids: Sequence[Optional[int]] = [None] * len(batch)
+        try:
+            async with database_executor.transaction() as session:
+                result: Result[Tuple[int]] = await session.execute(
+                    _INSERT_SANCTION, [row for row, _ in batch]
+                )
+                ids = result.scalars().all()
+        except Exception:
+            logger.exception("%d sanctions could not be saved in database.", len(batch))
+        for (_, future), sanction_id in zip(batch, ids):
+            if not future.done():
+                future.set_result(sanction_id)
+
+
+async def _queue_sanction(row: Dict[str, Any]) -> Optional[int]:
+    """
+    Add a sanction to the pending ones and wait for its insertion
+
+    Parameters
+    ----------
+    row : Dict[str, Any]
+        Values of the sanction to insert
+
+    Returns
+    -------
+    Optional[int]
+        The id of the sanction once it has been inserted, None if it failed
+    """
+    global _flush_task
+    future: asyncio.Future[Optional[int]] = asyncio.get_running_loop().create_future()
+    _pending.append((row, future))
+    # insert right away, unless a flush in progress will pick it up when done
+    if not _flush_task or _flush_task.done():
+        _flush_task = asyncio.create_task(flush_pending_sanctions())
+    return await future
+
+
+async def _notify_victim(
+    victim: discord.User,
+    type: SanctionType,
+    duration: Optional[int],
+    reason: Optional[str],
+    send_dm: bool,
+) -> bool:
+    """
+    Send the sanction to the victim in private message
+
+    Parameters
+    ----------
+    victim : discord.User
+        The sanctioned user
+
+    type : SanctionType
+        The type of the sanction
+
+    duration : Optional[int]
+        The duration of the sanction in seconds
+
+    reason : Optional[str]
+        The reason of the sanction
+
+    send_dm : bool
+        Should the victim be notified in private message
+
+    Returns
+    -------
+    bool
+        True if the message has been delivered
+    """
+    if not send_dm:
+        return False
+    try:
+        await victim.send(view=LogVictim(type, duration, reason))
+    except discord.Forbidden:
+        return False
+    return True
+
 
 async def log_sanction(
     guild: discord.Guild,
@@ -25,77 +133,135 @@ async def log_sanction(
     send_dm: bool,
     reason: Optional[str] = None,
     duration: Optional[int] = None,
-) -> None:
+    date: Optional[datetime.datetime] = None,
+) -> Optional[int]:
+    """
+    Save a sanction in database then notify the victim and the staff
+
+    Parameters
+    ----------
+    guild : discord.Guild
+        The guild where the sanction took place
+
+    victim : discord.User
+        The sanctioned user
+
+    staff : Optional[discord.Member]
+        The staff member behind the sanction if known
+
+    type : SanctionType
+        The type of the sanction
+
+    send_dm : bool
+        Should the victim be notified in private message
+
+    reason : Optional[str]
+        The reason of the sanction
+
+    duration : Optional[int]
+        The duration of the sanction in seconds
+
+    date : Optional[datetime.datetime]
+        When the sanction took place, defaults to now
+
+    Returns
+    -------
+    Optional[int]
+        The id of the newly saved sanction, None if it could not be saved
+    """
     guild_wrapper: GuildWrapper = GuildWrapper(guild, fetch=False)
     sanction_channel: Optional[discord.TextChannel] = guild_wrapper.sanctions_channel
     if not sanction_channel:
         logger.fatal(f"Can not find channel to log sanction for {victim.id}.")
-        return
-    victim_model: Optional[MemberModel] = UserWrapper(victim).as_member_model(guild)
-    if not victim_model:
-        logger.fatal(f"Can not log sanction for {victim.id} no model has been found.")
-        return
-    staff_wrapper: Optional[MemberWrapper] = MemberWrapper(staff) if staff else None
-    database_executor.execute(
-        insert(SanctionModel).values(
-            guild_id=guild.id,
-            victim_id=victim_model.member_id,
-            staff_id=staff_wrapper.member_id if staff_wrapper else None,
-            sanction_type=type,
-            sanction_date=datetime.datetime.now(),
-            sanction_reason=reason,
-            sanction_duration=duration,
+        return None
+    # resolve victim and staff member ids in a single query
+    user_ids: List[int] = [victim.id, staff.id] if staff else [victim.id]
+    result: Optional[Result[Tuple[int, int]]] = await database_executor.aexecute(
+        select(MemberModel.user_id, MemberModel.member_id).where(
+            MemberModel.guild_id == guild.id,
+            MemberModel.user_id.in_(user_ids),
         )
     )
-    dm_sent: bool = False
-    if send_dm:
-        try:
-            await victim.send(view=LogVictim(type, duration, reason))
-            dm_sent = True
-        except discord.Forbidden:
-            pass
+    member_ids: Dict[int, int] = dict(result.tuples().all()) if result else {}
+    if victim.id not in member_ids:
+        logger.fatal(f"Can not log sanction for {victim.id} no model has been found.")
+        return None
+    # the insert and the private message are independent, wait for both at once
+    sanction_id, dm_sent = await asyncio.gather(
+        _queue_sanction(
+            dict(
+                guild_id=guild.id,
+                victim_id=member_ids[victim.id],
+                staff_id=member_ids.get(staff.id) if staff else None,
+                sanction_type=type,
+                sanction_date=date or datetime.datetime.now(),
+                sanction_reason=reason,
+                sanction_duration=duration,
+            )
+        ),
+        _notify_victim(victim, type, duration, reason, send_dm),
+    )
     await sanction_channel.send(
         view=LogStaff(
             type, victim, staff, duration, reason, send_dm=send_dm, dm_sent=dm_sent
         ),
         allowed_mentions=discord.AllowedMentions.none(),
     )
+    return sanction_id
 
 
 class VictimText(ui.TextDisplay):
     def __init__(self, type: SanctionType):
-        text: str = ""
-        if type == SanctionType.WARN:
-            text = "Vous avez été averti."
-        elif type == SanctionType.TIMEOUT:
-            text = "Vous avez été rendu muet."
-        elif type == SanctionType.UNTIMEOUT:
-            text = "Vous n'êtes plus muet."
-        elif type == SanctionType.KICK:
-            text = "Vous été expulsé."
-        elif type == SanctionType.BAN:
-            text = "Vous avez été banni."
-        elif type == SanctionType.UNBAN:
-            text = "Vous avez été débanni."
-        super().__init__(text)
+        super().__init__(_TEXTS[type][0])
 
 
 class StaffText(ui.TextDisplay):
     def __init__(self, user: discord.User, type: SanctionType):
-        text: str = f"{user.mention} ({user.name}) "
-        if type == SanctionType.WARN:
-            text += "a été averti."
-        elif type == SanctionType.TIMEOUT:
-            text += "a été rendu muet."
-        elif type == SanctionType.UNTIMEOUT:
-            text += "n'est plus muet."
-        elif type == SanctionType.KICK:
-            text += "a été expulsé."
-        elif type == SanctionType.BAN:
-            text += "a été banni."
-        elif type == SanctionType.UNBAN:
-            text += "a été débanni."
-        super().__init__(text)
+        super().__init__(f"{user.mention} ({user.name}) {_TEXTS[type][1]}")
+
+
+def _sanction_container(
+    type: SanctionType,
+    header: List[ui.Item[Any]],
+    duration: Optional[int],
+    reason: Optional[str],
+) -> ui.Container:
+    """
+    Build the container shared by victim's and staff's logs
+
+    Parameters
+    ----------
+    type : SanctionType
+        The type of the sanction
+
+    header : List[ui.Item[Any]]
+        Items describing the sanction, put under the title
+
+    duration : Optional[int]
+        The duration of the sanction in seconds
+
+    reason : Optional[str]
+        The reason of the sanction
+
+    Returns
+    -------
+    ui.Container
+        The container to which other items can still be added
+    """
+    container: ui.Container = ui.Container()
+    container.add_item(ui.TextDisplay(_TITLE))
+    for item in header:
+        container.add_item(item)
+    if duration:
+        container.add_item(
+            ui.TextDisplay(
+                _DURATION_TEMPLATE.format(duration=humanize.naturaldelta(duration))
+            )
+        )
+    if reason:
+        container.add_item(ui.TextDisplay(_REASON_TEMPLATE.format(reason=reason)))
+    container.accent_colour = type.get_colour
+    return container
 
 
 class LogVictim(ui.LayoutView):
@@ -104,21 +270,7 @@ class LogVictim(ui.LayoutView):
     ):
         super().__init__()
 
-        container: ui.Container = ui.Container()
-        container.add_item(ui.TextDisplay("## Sanction"))
-        container.add_item(VictimText(type))
-        if duration:
-            container.add_item(
-                ui.TextDisplay(
-                    f"La durée de la sanction est de {humanize.naturaldelta(duration)}"
-                )
-            )
-        if reason:
-            container.add_item(
-                ui.TextDisplay(f"La raison de la sanction est ```yml\n{reason}\n```")
-            )
-        container.accent_colour = type.get_colour
-        self.add_item(container)
+        self.add_item(_sanction_container(type, [VictimText(type)], duration, reason))
 
 
 class LogStaff(ui.LayoutView):
@@ -138,23 +290,12 @@ class LogStaff(ui.LayoutView):
     ):
         super().__init__()
 
-        container: ui.Container = ui.Container()
-        container.add_item(ui.TextDisplay("## Sanction"))
-        container.add_item(StaffText(victim, type))
+        header: List[ui.Item[Any]] = [StaffText(victim, type)]
         if staff:
-            container.add_item(
+            header.append(
                 ui.TextDisplay(f"La sanction a été infligée par {staff.mention}")
             )
-        if duration:
-            container.add_item(
-                ui.TextDisplay(
-                    f"La durée de la sanction est de {humanize.naturaldelta(duration)}"
-                )
-            )
-        if reason:
-            container.add_item(
-                ui.TextDisplay(f"La raison de la sanction est ```yml\n{reason}\n```")
-            )
+        container: ui.Container = _sanction_container(type, header, duration, reason)
         if send_dm:
             if dm_sent:
                 container.add_item(ui.TextDisplay("L'utilisateur a été notifié."))
@@ -162,5 +303,4 @@ class LogStaff(ui.LayoutView):
                 container.add_item(
                     ui.TextDisplay("L'utilisateur n'a pas pu être notifié.")
                 )
-        container.accent_colour = type.get_colour
         self.add_item(container)
@@ -1,3 +1,5 @@
+from typing import Optional
+
 import discord
 import discord.ui as ui
 
@@ -31,7 +33,7 @@ class WarnModal(ui.Modal):
     async def on_submit(self, interaction: discord.Interaction) -> None:
         if not interaction.guild or not isinstance(interaction.user, discord.Member):
             return
-        await log_sanction(
+        sanction_id: Optional[int] = await log_sanction(
             interaction.guild,
             self._member._user,
             interaction.user,
@@ -40,7 +42,8 @@ class WarnModal(ui.Modal):
             self._reason.value,
         )
         await interaction.response.send_message(
-            f"{self._member.mention} a été averti.",
+            f"{self._member.mention} a été averti"
+            + (f" (sanction #{sanction_id})." if sanction_id else "."),
             ephemeral=self._ephemeral,
             allowed_mentions=discord.AllowedMentions.none(),
         )
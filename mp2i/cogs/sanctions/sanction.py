@@ -1,8 +1,7 @@
 import datetime
 import humanize
 import logging
-from math import ceil
-from typing import List, Optional, Sequence
+from typing import Any, Dict, FrozenSet, List, Optional, Sequence, Set, Tuple
 
 import discord
 from discord.app_commands import (
@@ -13,14 +12,16 @@ from discord.app_commands import (
     rename,
 )
 from discord.ext.commands import Bot, Cog, GroupCog
-from sqlalchemy import Executable, Result, delete, select
+from sqlalchemy import Result, delete, func, lambda_stmt, select
+from sqlalchemy.orm import joinedload, load_only, raiseload
+from sqlalchemy.sql.lambdas import StatementLambdaElement
 
 import mp2i.database.executor as database_executor
 from mp2i.cogs.sanctions._editor import SanctionEditorModal
-from mp2i.cogs.sanctions._logs import log_sanction
+from mp2i.cogs.sanctions._logs import flush_pending_sanctions, log_sanction
 from mp2i.database.models.member import MemberModel
 from mp2i.database.models.sanction import SanctionModel, SanctionType
-from mp2i.utils.discord import has_any_role, has_any_roles_predicate
+from mp2i.utils.discord import has_any_role, has_any_roles_check
 from mp2i.utils.paginator import EmbedPaginator
 from mp2i.wrappers.guild import GuildWrapper
 
@@ -28,6 +29,121 @@ from ._warn import WarnModal
 
 logger: logging.Logger = logging.getLogger(__name__)
 
+# built once, the context menu check of every instance is the same
+_STAFF_CHECK = has_any_roles_check("Administrateur", "Modérateur")
+
+# audit log actions directly leading to a sanction
+_ACTION_SANCTIONS: Dict[discord.AuditLogAction, SanctionType] = {
+    discord.AuditLogAction.ban: SanctionType.BAN,
+    discord.AuditLogAction.unban: SanctionType.UNBAN,
+    discord.AuditLogAction.kick: SanctionType.KICK,
+}
+# audit log actions that may lead to a sanction, any other entry is ignored
+_TRACKED_ACTIONS: FrozenSet[discord.AuditLogAction] = frozenset(
+    {*_ACTION_SANCTIONS, discord.AuditLogAction.member_update}
+)
+_SECOND: datetime.timedelta = datetime.timedelta(seconds=1)
+
+# pieces of an entry of the sanctions' list
+_ENTRY_TEMPLATE: str = (
+    "**{id}** ━ Le {date:%d/%m/%Y à %H:%M}\n\n"
+    "**Type :** {type}\n"
+    "**Membre :** {victim}\n"
+)
+_DURATION_LINE: str = "**Temps :** {duration}\n"
+_STAFF_LINE: str = "**Modérateur :** {staff}\n"
+_REASON_LINE: str = "**Raison :** ```yml\n{reason}```\n"
+
+# the list only needs the user ids of the victim and the staff, do not cascade into
+# the members' own selectin relationships (sanctions, promotions, tickets)
+_LIST_LOAD_OPTIONS: Tuple[Any, ...] = (
+    joinedload(SanctionModel.victim).options(
+        load_only(MemberModel.user_id), raiseload("*")
+    ),
+    joinedload(SanctionModel.staff).options(
+        load_only(MemberModel.user_id), raiseload("*")
+    ),
+)
+
+
+def _filter_listed(
+    statement: StatementLambdaElement,
+    guild_id: int,
+    user_id: Optional[int],
+    type: Optional[SanctionType],
+) -> StatementLambdaElement:
+    """
+    Restrict a statement on sanctions to the ones asked by the list command
+
+    Each combination of filters is a distinct cached statement, only the values are
+    bound again on each call
+
+    Parameters
+    ----------
+    statement : StatementLambdaElement
+        The statement selecting from sanctions
+
+    guild_id : int
+        The guild of the sanctions
+
+    user_id : Optional[int]
+        The user id of the victim if filtered
+
+    type : Optional[SanctionType]
+        The type of the sanctions if filtered
+
+    Returns
+    -------
+    StatementLambdaElement
+        The filtered statement
+    """
+    statement += lambda s: s.where(SanctionModel.guild_id == guild_id)
+    if user_id:
+        # filter on the user_id of the related MemberModel (victim)
+        statement += lambda s: s.where(
+            SanctionModel.victim_id.in_(
+                select(MemberModel.member_id).where(
+                    MemberModel.guild_id == guild_id,
+                    MemberModel.user_id == user_id,
+                )
+            )
+        )
+    if type:
+        statement += lambda s: s.where(SanctionModel.sanction_type == type)
+    return statement
+
+
+def _timeout_sanction(
+    entry: discord.AuditLogEntry,
+) -> Tuple[Optional[SanctionType], Optional[int]]:
+    """
+    Find the sanction behind a member update, if any
+
+    Parameters
+    ----------
+    entry : discord.AuditLogEntry
+        The member update entry
+
+    Returns
+    -------
+    Tuple[Optional[SanctionType], Optional[int]]
+        The type of the sanction and its duration in seconds, (None, None) if the
+        update is not a sanction
+    """
+    before: Optional[datetime.datetime] = getattr(entry.before, "timed_out_until", None)
+    after: Optional[datetime.datetime] = getattr(entry.after, "timed_out_until", None)
+    # nickname, roles... updates are not sanctions
+    if before == after:
+        return None, None
+    if not after:
+        return SanctionType.UNTIMEOUT, None
+    # a shortened timeout is not a new sanction
+    if before and before > after:
+        return None, None
+    # total duration from the entry, independent of the bot's latency, rounded up to
+    # the second with integer timedelta division instead of float arithmetic
+    return SanctionType.TIMEOUT, -((entry.created_at - after) // _SECOND)
+
 
 @guild_only()
 class Sanction(GroupCog, name="sanction", description="Gestion des sanctions"):
@@ -47,13 +163,15 @@ class Sanction(GroupCog, name="sanction", description="Gestion des sanctions"):
             type=discord.AppCommandType.user,
         )
         ctx_menu.guild_only = True
-        ctx_menu.add_check(
-            lambda interaction: has_any_roles_predicate(
-                interaction, "Administrateur", "Modérateur"
-            )
-        )
+        ctx_menu.add_check(_STAFF_CHECK)
         bot.tree.add_command(ctx_menu)
 
+    async def cog_unload(self) -> None:
+        """
+        Save sanctions still waiting to be inserted
+        """
+        await flush_pending_sanctions()
+
     async def _warn_user(
         self, interaction: discord.Interaction, member: discord.Member, ephemeral: bool
     ) -> None:
@@ -114,6 +232,48 @@ class Sanction(GroupCog, name="sanction", description="Gestion des sanctions"):
         """
         await self._warn_user(interaction, member, False)
 
+    def _format_sanction(
+        self,
+        mentions: Dict[int, str],
+        sanction: SanctionModel,
+    ) -> str:
+        """
+        Format a sanction as an entry of the sanctions' list
+
+        Parameters
+        ----------
+        mentions : Dict[int, str]
+            How to display the users involved in the listed sanctions by user id
+
+        sanction : SanctionModel
+            The sanction to format
+
+        Returns
+        -------
+        str
+            The formatted sanction
+        """
+        parts: List[str] = [
+            _ENTRY_TEMPLATE.format(
+                id=sanction.sanction_id,
+                date=sanction.sanction_date,
+                type=sanction.sanction_type.label,
+                victim=mentions[sanction.victim.user_id],
+            )
+        ]
+        if sanction.sanction_duration:
+            parts.append(
+                _DURATION_LINE.format(
+                    duration=humanize.naturaldelta(sanction.sanction_duration)
+                )
+            )
+        if sanction.staff:
+            parts.append(_STAFF_LINE.format(staff=mentions[sanction.staff.user_id]))
+        if sanction.sanction_reason:
+            parts.append(_REASON_LINE.format(reason=sanction.sanction_reason))
+        parts.append("\n")
+        return "".join(parts)
+
     @command(name="list", description="Liste les sanctions")
     @describe(user="Utilisateur concerné", type="Type de sanctions")
     @rename(user="utilisateur")
@@ -126,53 +286,61 @@ class Sanction(GroupCog, name="sanction", description="Gestion des sanctions"):
     ):
         if not interaction.guild:
             return
-        await interaction.response.defer()
-        statement: Executable = select(SanctionModel).where(
-            SanctionModel.guild_id == interaction.guild.id
-        )
-        if user:
-            # Join the related MemberModel (victim) and filter on the member's user_id
-            statement = statement.join(SanctionModel.victim).where(
-                MemberModel.user_id == user.id
+        guild: discord.Guild = interaction.guild
+        # acknowledge before any database work, discord shows the bot as thinking
+        await interaction.response.defer(thinking=True)
+        user_id: Optional[int] = user.id if user else None
+        # count server side, only the displayed page is fetched
+        result: Optional[Result[Tuple[int]]] = await database_executor.aexecute(
+            _filter_listed(
+                lambda_stmt(lambda: select(func.count()).select_from(SanctionModel)),
+                guild.id,
+                user_id,
+                type,
             )
-        if type:
-            statement = statement.where(SanctionModel.sanction_type == type)
-        result: Optional[Result[SanctionModel]] = database_executor.execute(statement.order_by(SanctionModel.sanction_id.desc()))
+        )
         if not result:
             await interaction.edit_original_response(
                 content="Aucune réponse de la base de données."
             )
             return
-        sanctions: Sequence[SanctionModel] = result.scalars().all()
-        entries: List[str] = []
-        content: str = ""
-        for sanction in sanctions:
-            content = f"**{sanction.sanction_id}** ━ Le {sanction.sanction_date:%d/%m/%Y à %H:%M}\n\n"
-            content += f"**Type :** {sanction.sanction_type.value[0]}\n"
-
-            victim: Optional[discord.Member] = interaction.guild.get_member(
-                sanction.victim.user_id
+        count: int = result.scalar_one()
+
+        async def fetch_entries(offset: int, limit: int) -> List[str]:
+            statement: StatementLambdaElement = _filter_listed(
+                lambda_stmt(lambda: select(SanctionModel).options(*_LIST_LOAD_OPTIONS)),
+                guild.id,
+                user_id,
+                type,
             )
-            content += f"**Membre :** {victim.mention if victim else sanction.victim.user_id}\n"
-            if sanction.sanction_duration:
-                content += f"**Temps :** {humanize.naturaldelta(sanction.sanction_duration)}\n"
-
-            if sanction.staff:
-                staff: Optional[discord.Member] = interaction.guild.get_member(
-                    sanction.staff.user_id
-                )
-                content += f"**Modérateur :** {staff.mention if staff else sanction.staff.user_id}\n"
-            if sanction.sanction_reason:
-                content += f"**Raison :** ```yml\n{sanction.sanction_reason}```\n"
-            content += "\n"
-            entries.append(content)
+            statement += lambda s: s.order_by(SanctionModel.sanction_id.desc())
+            statement += lambda s: s.offset(offset).limit(limit)
+            page: Optional[Result[SanctionModel]] = await database_executor.aexecute(
+                statement
+            )
+            if not page:
+                return []
+            sanctions: Sequence[SanctionModel] = page.scalars().all()
+            # resolve each distinct victim and staff once for the whole page
+            user_ids: Set[int] = {sanction.victim.user_id for sanction in sanctions}
+            user_ids.update(
+                sanction.staff.user_id for sanction in sanctions if sanction.staff
+            )
+            # mention members still in the guild, fall back on the raw user id
+            mentions: Dict[int, str] = {}
+            for listed_id in user_ids:
+                member: Optional[discord.Member] = guild.get_member(listed_id)
+                mentions[listed_id] = member.mention if member else str(listed_id)
+            return [self._format_sanction(mentions, sanction) for sanction in sanctions]
 
         await EmbedPaginator(
             author=interaction.user.id,
             title="Liste des sanctions",
-            header=f"Nombre de sanctions {len(sanctions)}",
-            entries=entries,
+            header=f"Nombre de sanctions {count}",
+            entries=[],
             colour=0xFF00FF,
+            fetcher=fetch_entries,
+            count=count,
         ).send(interaction)
 
     @command(name="edit", description="Édite une sanction")
@@ -186,7 +354,7 @@ class Sanction(GroupCog, name="sanction", description="Gestion des sanctions"):
     ):
         if not interaction.guild:
             return
-        result: Optional[Result[SanctionModel]] = database_executor.execute(
+        result: Optional[Result[SanctionModel]] = await database_executor.aexecute(
             select(SanctionModel).where(SanctionModel.sanction_id == id)
         )
         if not result or not (sanction := result.scalar_one_or_none()):
@@ -226,91 +394,87 @@ class Sanction(GroupCog, name="sanction", description="Gestion des sanctions"):
             )
             return
         await interaction.response.defer(ephemeral=True)
-        result: Optional[Result[SanctionModel]] = database_executor.execute(
-            select(SanctionModel).where(SanctionModel.sanction_id == id)
+        # delete and check existence in a single round-trip
+        result: Optional[Result[Tuple[SanctionType, Optional[str]]]] = (
+            await database_executor.aexecute(
+                delete(SanctionModel)
+                .where(SanctionModel.sanction_id == id)
+                .returning(SanctionModel.sanction_type, SanctionModel.sanction_reason)
+            )
+        )
+        deleted: Optional[Tuple[SanctionType, Optional[str]]] = (
+            result.tuples().one_or_none() if result else None
         )
-        if not result or not result.scalar_one_or_none():
+        if not deleted:
             await interaction.edit_original_response(
                 content="Aucune sanction n'a été trouvé avec cet identifiant."
             )
             return
-        database_executor.execute(
-            delete(SanctionModel).where(SanctionModel.sanction_id == id)
+        sanction_type, sanction_reason = deleted
+        content: str = (
+            f"La sanction #{id} ({sanction_type.label}) a été supprimée par "
+            f"{interaction.user.mention}"
         )
+        if sanction_reason:
+            content += f"\nRaison de la sanction : ```yml\n{sanction_reason}```"
         await sanction_channel.send(
-            f"La sanction #{id} a été supprimée par {interaction.user.mention}",
+            content,
             allowed_mentions=discord.AllowedMentions.none(),
         )
         await interaction.edit_original_response(content=f"Sanction #{id} supprimée.")
 
     @Cog.listener("on_audit_log_entry_create")
     async def on_new_log(self, entry: discord.AuditLogEntry):
-        if not (
-            entry.action == discord.AuditLogAction.ban
-            or entry.action == discord.AuditLogAction.unban
-            or entry.action == discord.AuditLogAction.member_update
-            or entry.action == discord.AuditLogAction.kick
-        ):
+        if entry.action not in _TRACKED_ACTIONS:
+            return
+
+        # a single timestamp for the whole event
+        now: datetime.datetime = datetime.datetime.now()
+        sanction_type: Optional[SanctionType]
+        duration: Optional[int]
+        if entry.action == discord.AuditLogAction.member_update:
+            sanction_type, duration = _timeout_sanction(entry)
+        else:
+            sanction_type, duration = _ACTION_SANCTIONS.get(entry.action), None
+        if not sanction_type:
+            return
+        # nothing to log into, do not request discord for the victim
+        if not GuildWrapper(entry.guild, fetch=False).sanctions_channel:
             return
 
         target = entry.target
         if not target or not isinstance(target.id, int):
             return
 
-        victim: discord.User
-        try:
-            victim = await self._bot.fetch_user(target.id)
-        except discord.NotFound:
-            logger.error(
-                f"Failed to fetch user {target.id} ! Cannot log their sanction."
-            )
-            return
+        # discord.py already resolves the target from its cache when it can, then
+        # only request discord when the user is not in the bot's cache either
+        victim: Optional[discord.User] = (
+            target
+            if isinstance(target, discord.User)
+            else self._bot.get_user(target.id)
+        )
+        if not victim:
+            try:
+                victim = await self._bot.fetch_user(target.id)
+            except discord.NotFound:
+                logger.error(
+                    f"Failed to fetch user {target.id} ! Cannot log their sanction."
+                )
+                return
         staff: Optional[discord.Member | discord.User] = entry.user
         if not staff or not isinstance(staff, discord.Member):
             return
 
-        if entry.action == discord.AuditLogAction.ban:
-            await log_sanction(
-                entry.guild, victim, staff, SanctionType.BAN, True, entry.reason
-            )
-        elif entry.action == discord.AuditLogAction.unban:
-            await log_sanction(entry.guild, victim, staff, SanctionType.UNBAN, True)
-        elif entry.action == discord.AuditLogAction.kick:
-            await log_sanction(
-                entry.guild, victim, staff, SanctionType.KICK, True, entry.reason
-            )
-        elif entry.action == discord.AuditLogAction.member_update and (
-            hasattr(entry.before, "timed_out_until")
-            and hasattr(entry.after, "timed_out_until")
-            and entry.before.timed_out_until
-            and not entry.after.timed_out_until
-        ):
-            await log_sanction(
-                entry.guild, victim, staff, SanctionType.UNTIMEOUT, True, entry.reason
-            )
-        elif entry.action == discord.AuditLogAction.member_update and (
-            hasattr(entry.before, "timed_out_until")
-            and hasattr(entry.after, "timed_out_until")
-            and (
-                not entry.before.timed_out_until
-                and entry.after.timed_out_until
-                or entry.before.timed_out_until
-                and entry.before.timed_out_until < entry.after.timed_out_until
-            )
-        ):
-            end_of_sanction: int = entry.after.timed_out_until.timestamp()
-            duration: int = int(
-                ceil(end_of_sanction - datetime.datetime.now().timestamp())
-            )
-            await log_sanction(
-                entry.guild,
-                victim,
-                staff,
-                SanctionType.TIMEOUT,
-                True,
-                entry.reason,
-                duration,
-            )
+        await log_sanction(
+            entry.guild,
+            victim,
+            staff,
+            sanction_type,
+            True,
+            entry.reason if sanction_type != SanctionType.UNBAN else None,
+            duration,
+            now,
+        )
 
 
 async def setup(bot: Bot) -> None:
@@ -0,0 +1,282 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
+
+from sqlalchemy import Result, bindparam, select
+
+import mp2i.database.executor as database_executor
+from mp2i.database.models.member import MemberModel
+from mp2i.database.models.school import SchoolModel, SchoolType
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+# sorted (casefolded name, name) of the schools of each guild, loaded on first use
+_school_names: Dict[int, List[Tuple[str, str]]] = {}
+# casefolded names of the schools of each guild, loaded with the names
+_folded_names: Dict[int, FrozenSet[str]] = {}
+# loads of names in progress, shared by concurrent autocompletes of a guild
+_names_loads: "Dict[int, asyncio.Task[Optional[List[Tuple[str, str]]]]]" = {}
+_SCHOOL_NAMES = select(SchoolModel.school_name).where(
+    SchoolModel.guild_id == bindparam("guild_id")
+)
+# recently found schools by (guild id, school name), with their expiry date
+_SCHOOL_CACHE_SIZE: int = 512
+_SCHOOL_CACHE_TTL: float = 30.0
+_schools: "OrderedDict[Tuple[int, str], Tuple[float, SchoolModel]]" = OrderedDict()
+# (school name, school type, referent user id) of each guild, sorted by school name
+_school_referents: Dict[int, List[Tuple[str, SchoolType, int]]] = {}
+# referent user ids of each guild by school thread id, and all of them
+_thread_referents: Dict[int, Dict[int, Set[int]]] = {}
+_referent_users: Dict[int, Set[int]] = {}
+_SCHOOL_REFERENTS = (
+    select(
+        SchoolModel.school_name,
+        SchoolModel.school_type,
+        MemberModel.user_id,
+        SchoolModel.thread_id,
+    )
+    .join(MemberModel, MemberModel.member_id == SchoolModel.referent_id)
+    .where(SchoolModel.guild_id == bindparam("guild_id"))
+    .order_by(SchoolModel.school_name)
+)
+
+
+async def _load_school_names(guild_id: int) -> Optional[List[Tuple[str, str]]]:
+    """
+    Load the names of the schools of a guild, kept if not invalidated meanwhile
+
+    Parameters
+    ----------
+    guild_id : int
+        The guild id
+
+    Returns
+    -------
+    Optional[List[Tuple[str, str]]]
+        Casefolded and original names sorted, None if database is unreachable
+    """
+    result: Optional[Result[Tuple[str]]] = await database_executor.aexecute(
+        _SCHOOL_NAMES, {"guild_id": guild_id}
+    )
+    if not result:
+        return None
+    names = sorted((name.casefold(), name) for name in result.scalars())
+    if _names_loads.get(guild_id) is asyncio.current_task():
+        _school_names[guild_id] = names
+        _folded_names[guild_id] = frozenset(folded for folded, _ in names)
+    return names
+
+
+async def school_names(guild_id: int) -> Optional[List[Tuple[str, str]]]:
+    """
+    Get the sorted names of the schools of a guild, from memory if possible
+
+    Parameters
+    ----------
+    guild_id : int
+        The guild id
+
+    Returns
+    -------
+    Optional[List[Tuple[str, str]]]
+        Casefolded and original names sorted, None if database is unreachable
+    """
+    if (names := _school_names.get(guild_id)) is not None:
+        return names
+
+    # keystrokes arriving while names are loaded wait for the same query
+    if not (task := _names_loads.get(guild_id)):
+        task = asyncio.create_task(_load_school_names(guild_id))
+        _names_loads[guild_id] = task
+
+        def forget(done: asyncio.Task[Optional[List[Tuple[str, str]]]]) -> None:
+            if _names_loads.get(guild_id) is done:
+                del _names_loads[guild_id]
+
+        task.add_done_callback(forget)
+    # an autocomplete giving up must not cancel the load of the others
+    return await asyncio.shield(task)
+
+
+async def school_name_taken(guild_id: int, name: str) -> Optional[bool]:
+    """
+    Check if a school of a guild already has a name, ignoring case
+
+    Parameters
+    ----------
+    guild_id : int
+        The guild id
+
+    name : str
+        The school name
+
+    Returns
+    -------
+    Optional[bool]
+        True if the name is taken, None if database is unreachable
+    """
+    if (names := await school_names(guild_id)) is None:
+        return None
+    if (folded_names := _folded_names.get(guild_id)) is None:
+        # invalidated while loading, use the loaded names without keeping them
+        folded_names = frozenset(folded for folded, _ in names)
+    return name.casefold() in folded_names
+
+
+async def _load_referents(guild_id: int) -> bool:
+    """
+    Load the referents of the schools of a guild and index them
+
+    Parameters
+    ----------
+    guild_id : int
+        The guild id
+
+    Returns
+    -------
+    bool
+        True if referents are in memory, False if database is unreachable
+    """
+    if guild_id in _school_referents:
+        return True
+
+    result: Optional[Result[Tuple[str, SchoolType, int, Optional[int]]]] = (
+        await database_executor.aexecute(_SCHOOL_REFERENTS, {"guild_id": guild_id})
+    )
+    if not result:
+        return False
+    referents: List[Tuple[str, SchoolType, int]] = []
+    by_thread: Dict[int, Set[int]] = {}
+    for name, type, user_id, thread_id in result:
+        referents.append((name, type, user_id))
+        if thread_id:
+            by_thread.setdefault(thread_id, set()).add(user_id)
+    _school_referents[guild_id] = referents
+    _thread_referents[guild_id] = by_thread
+    _referent_users[guild_id] = {user_id for _, _, user_id in referents}
+    return True
+
+
+async def school_referents(
+    guild_id: int,
+) -> Optional[List[Tuple[str, SchoolType, int]]]:
+    """
+    Get the referents of the schools of a guild, from memory if possible
+
+    Parameters
+    ----------
+    guild_id : int
+        The guild id
+
+    Returns
+    -------
+    Optional[List[Tuple[str, SchoolType, int]]]
+        School name, school type and referent user id of the schools with a
+        referent sorted by school name, None if database is unreachable
+    """
+    if not await _load_referents(guild_id):
+        return None
+    return _school_referents[guild_id]
+
+
+async def thread_referents(guild_id: int) -> Optional[Dict[int, Set[int]]]:
+    """
+    Get the referents of the schools of a guild by school thread
+
+    Parameters
+    ----------
+    guild_id : int
+        The guild id
+
+    Returns
+    -------
+    Optional[Dict[int, Set[int]]]
+        Referent user ids by thread id, None if database is unreachable
+    """
+    if not await _load_referents(guild_id):
+        return None
+    return _thread_referents[guild_id]
+
+
+async def referent_users(guild_id: int) -> Optional[Set[int]]:
+    """
+    Get the users referent of at least one school of a guild
+
+    Parameters
+    ----------
+    guild_id : int
+        The guild id
+
+    Returns
+    -------
+    Optional[Set[int]]
+        Referent user ids, None if database is unreachable
+    """
+    if not await _load_referents(guild_id):
+        return None
+    return _referent_users[guild_id]
+
+
+def cached_school(guild_id: int, name: str) -> Optional[SchoolModel]:
+    """
+    Get a recently found school from memory
+
+    Parameters
+    ----------
+    guild_id : int
+        The guild id
+
+    name : str
+        The school name
+
+    Returns
+    -------
+    Optional[SchoolModel]
+        The school if cached and not expired, None otherwise
+    """
+    key: Tuple[int, str] = (guild_id, name)
+    if not (entry := _schools.get(key)):
+        return None
+    expiry, school = entry
+    if expiry < time.monotonic():
+        del _schools[key]
+        return None
+    _schools.move_to_end(key)
+    return school
+
+
+def cache_school(school: SchoolModel) -> None:
+    """
+    Remember a school found in database, evicting the least recently used one if full
+
+    Parameters
+    ----------
+    school : SchoolModel
+        The school to remember
+    """
+    key: Tuple[int, str] = (school.guild_id, school.school_name)
+    _schools[key] = (time.monotonic() + _SCHOOL_CACHE_TTL, school)
+    _schools.move_to_end(key)
+    if len(_schools) > _SCHOOL_CACHE_SIZE:
+        _schools.popitem(last=False)
+
+
+def invalidate_schools(guild_id: int) -> None:
+    """
+    Forget the cached schools of a guild, to reload them on next use
+
+    Parameters
+    ----------
+    guild_id : int
+        The guild id
+    """
+    _school_names.pop(guild_id, None)
+    _folded_names.pop(guild_id, None)
+    _names_loads.pop(guild_id, None)
+    _school_referents.pop(guild_id, None)
+    _thread_referents.pop(guild_id, None)
+    _referent_users.pop(guild_id, None)
+    for key in [key for key in _schools if key[0] == guild_id]:
+        del _schools[key]
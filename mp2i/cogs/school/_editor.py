@@ -1,23 +1,33 @@
+import asyncio
 import logging
-from typing import List, Optional, Self
+from typing import Dict, List, Optional, Self, Tuple
 
 import discord
 import discord.ui as ui
-from sqlalchemy import Result, select, update
+from sqlalchemy import Result, func, select, update
+from sqlalchemy.orm import aliased
 
 import mp2i.database.executor as database_executor
 from mp2i.database.models.school import SchoolModel, SchoolType
 from mp2i.wrappers.guild import GuildWrapper
 from mp2i.wrappers.member import MemberWrapper
 
+from ._cache import invalidate_schools, school_name_taken
+
 logger: logging.Logger = logging.getLogger(__name__)
 
+# name in config of the referent role of each type of school
+_REFERENT_ROLES: Dict[SchoolType, str] = {
+    SchoolType.CPGE: "Référent CPGE",
+    SchoolType.ECOLE: "Référent École",
+}
 
-async def _remove_old_referent(
+
+async def _referent_role(
     interaction: discord.Interaction, guild: GuildWrapper, school: SchoolModel
 ) -> Optional[discord.Role]:
     """
-    Remove referent from a school
+    Get the referent role of a school, tell the user when it is not defined
 
     Parameters
     ----------
@@ -33,11 +43,9 @@ async def _remove_old_referent(
     Returns
     -------
     Optional[discord.Role]
-        The role of the referent if found and all went well
+        The role of the referent if found
     """
-    role_name: str = "Référent " + (
-        "CPGE" if school.school_type == SchoolType.CPGE else "École"
-    )
+    role_name: str = _REFERENT_ROLES[school.school_type]
     roles: List[discord.Role] = guild.mapping_roles([role_name])
 
     if len(roles) == 0:
@@ -47,22 +55,68 @@ async def _remove_old_referent(
             ephemeral=True,
         )
         return None
-    role: discord.Role = roles[0]
+    return roles[0]
+
+
+async def _remove_old_referent(
+    guild: GuildWrapper, school: SchoolModel, role: discord.Role
+) -> None:
+    """
+    Remove the referent role from the current referent of a school
+
+    Parameters
+    ----------
+    guild : GuildWrapper
+        Wrapper of the guild
 
-    if school.referent:
-        old_referent: Optional[discord.Member] = guild.get_member(
-            school.referent.user_id
+    school : SchoolModel
+        The concerned school, before its referent is changed
+
+    role : discord.Role
+        The role of the referent
+    """
+    if not school.referent:
+        return
+    old_referent: Optional[discord.Member] = guild.get_member(school.referent.user_id)
+    if not old_referent:
+        return
+    try:
+        await old_referent.remove_roles(role)
+    except Exception:
+        logger.error(
+            "Could not remove %s role from user %d.",
+            role.name,
+            old_referent.id,
         )
-        if old_referent:
-            try:
-                await old_referent.remove_roles(role)
-            except Exception:
-                logger.error(
-                    "Could not remove %s role from user %d.",
-                    role.name,
-                    old_referent.id,
-                )
-    return role
+
+
+async def _replace_referent(
+    guild: GuildWrapper, school: SchoolModel, member: discord.Member, role: discord.Role
+) -> None:
+    """
+    Move the referent role of a school from its current referent to the new one
+
+    Parameters
+    ----------
+    guild : GuildWrapper
+        Wrapper of the guild
+
+    school : SchoolModel
+        The concerned school, before its referent is changed
+
+    member : discord.Member
+        The new referent
+
+    role : discord.Role
+        The role of the referent
+    """
+    # removed before added, both calls would race on the same member otherwise
+    if not school.referent or school.referent.user_id != member.id:
+        await _remove_old_referent(guild, school, role)
+    try:
+        await member.add_roles(role)
+    except Exception:
+        logger.error("Could not add %s role to user %d.", role.name, member.id)
 
 
 class SchoolNameModal(ui.Modal, title="Entrez un nouveau nom"):
@@ -101,32 +155,52 @@ class SchoolNameModal(ui.Modal, title="Entrez un nouveau nom"):
         """
         if not interaction.guild:
             return
-        result: Optional[Result[SchoolModel]] = database_executor.execute(
-            select(SchoolModel).where(
-                SchoolModel.guild_id == self._school.guild_id,
-                SchoolModel.school_name == self.name.value,
-            )
-        )
-
-        if not result:
+        # same case insensitive check as on creation, only a change of case of its own
+        # name does not conflict
+        taken: Optional[bool] = False
+        if self.name.value.casefold() != self._school.school_name.casefold():
+            taken = await school_name_taken(interaction.guild.id, self.name.value)
+        if taken is None:
             await interaction.response.send_message(
                 "Impossible de contacter la base de données.", ephemeral=True
             )
             return
-        if result.scalar_one_or_none():
+        if taken:
             await interaction.response.send_message(
                 "Un établissement avec ce nom existe déjà.", ephemeral=True
             )
             return
-        database_executor.execute(
+        # still guarded, another school may have been named the same meanwhile, the
+        # unique index on the lowered name rejects it otherwise
+        other = aliased(SchoolModel)
+        result: Optional[Result[Tuple[int]]] = await database_executor.aexecute(
             update(SchoolModel)
             .where(
                 SchoolModel.guild_id == interaction.guild.id,
                 SchoolModel.school_id == self._school.school_id,
+                ~select(other.school_id)
+                .where(
+                    other.guild_id == self._school.guild_id,
+                    func.lower(other.school_name) == func.lower(self.name.value),
+                )
+                .exists(),
             )
             .values(school_name=self.name.value)
+            .returning(SchoolModel.school_id)
         )
+
+        if not result:
+            await interaction.response.send_message(
+                "Impossible de contacter la base de données.", ephemeral=True
+            )
+            return
+        if result.scalar_one_or_none() is None:
+            await interaction.response.send_message(
+                "Un établissement avec ce nom existe déjà.", ephemeral=True
+            )
+            return
         self._school.school_name = self.name.value
+        invalidate_schools(interaction.guild.id)
         self._settings = self._settings._refresh_settings()
         logger.info(
             "User %d has changed name of school %d to user %s.",
@@ -212,7 +286,7 @@ class SchoolThreadSelector(ui.ChannelSelect["SchoolSettings"]):
         """
         if not self._view:
             return
-        database_executor.execute(
+        await database_executor.aexecute(
             update(SchoolModel)
             .where(
                 SchoolModel.school_id == self._school.school_id,
@@ -220,6 +294,7 @@ class SchoolThreadSelector(ui.ChannelSelect["SchoolSettings"]):
             .values(thread_id=self.values[0].id)
         )
         self._school.thread_id = self.values[0].id
+        invalidate_schools(self._school.guild_id)
         self._view = self._view._refresh_settings()
         logger.info(
             "User %d has changed thread of school %d to thread %d.",
@@ -279,36 +354,25 @@ class SchoolReferentButton(ui.Button["SchoolSettings"]):
                 "Cet établissement n'a pas de référent.", ephemeral=True
             )
             return
-        role_name: str = "Référent " + (
-            "CPGE" if self._school.school_type == SchoolType.CPGE else "École"
-        )
-        roles: List[discord.Role] = self._guild.mapping_roles([role_name])
-
-        if len(roles) == 0:
-            logger.error(
-                "Référent %s is not defined for guild %d", role_name, self._guild.id
-            )
-            await interaction.response.send_message(
-                "Le rôle de référent n'est pas défini pour ce type d'école.",
-                ephemeral=True,
-            )
-            return
-
-        role: Optional[discord.Role] = await _remove_old_referent(
+        role: Optional[discord.Role] = await _referent_role(
             interaction, self._guild, self._school
         )
         if not role:
             return
-        database_executor.execute(
-            update(SchoolModel)
-            .where(
-                SchoolModel.guild_id == interaction.guild.id,
-                SchoolModel.school_id == self._school.school_id,
-            )
-            .values(referent_id=None)
+        await asyncio.gather(
+            _remove_old_referent(self._guild, self._school, role),
+            database_executor.aexecute(
+                update(SchoolModel)
+                .where(
+                    SchoolModel.guild_id == interaction.guild.id,
+                    SchoolModel.school_id == self._school.school_id,
+                )
+                .values(referent_id=None)
+            ),
         )
         self._school.referent_id = None
         self._school.referent = None
+        invalidate_schools(self._school.guild_id)
         self._view = self._view._refresh_settings()
         logger.info(
             "User %d has removed referent of school %d.",
@@ -376,41 +440,38 @@ class SchoolReferentSelector(ui.UserSelect["SchoolSettings"]):
             )
             return
 
-        matching_schools: List[SchoolModel] = list(
-            filter(
-                lambda prom: prom.school_id == self._school.school_id,
-                member_wrapper.promotions,
-            )
-        )
-        if len(matching_schools) == 0:
+        school_id: int = self._school.school_id
+        if not any(
+            promotion.school_id == school_id for promotion in member_wrapper.promotions
+        ):
             await interaction.response.send_message(
                 "Cet utilisateur n'a jamais été dans cet établissement, il ne peut donc être référent de ce-dernier.",
                 ephemeral=True,
             )
             return
 
-        role: Optional[discord.Role] = await _remove_old_referent(
+        role: Optional[discord.Role] = await _referent_role(
             interaction, self._guild, self._school
         )
         if not role:
             return
 
-        database_executor.execute(
-            update(SchoolModel)
-            .where(
-                SchoolModel.guild_id == interaction.guild.id,
-                SchoolModel.school_id == self._school.school_id,
-            )
-            .values(referent_id=member_wrapper.member_id)
+        # database update is independent of the role changes, the old referent is
+        # read from the model before it is replaced
+        await asyncio.gather(
+            database_executor.aexecute(
+                update(SchoolModel)
+                .where(
+                    SchoolModel.guild_id == interaction.guild.id,
+                    SchoolModel.school_id == self._school.school_id,
+                )
+                .values(referent_id=member_wrapper.member_id)
+            ),
+            _replace_referent(self._guild, self._school, member, role),
         )
         self._school.referent_id = member_wrapper.member_id
         self._school.referent = member_wrapper.as_model
-        try:
-            await member_wrapper.add_roles(role)
-        except Exception:
-            logger.error(
-                "Could not add %s role to user %d.", role.name, member_wrapper.id
-            )
+        invalidate_schools(self._school.guild_id)
         self._view = self._view._refresh_settings()
         logger.info(
             "User %d has changed referent of school %d to user %d.",
@@ -443,14 +504,18 @@ class SchoolSettings(ui.LayoutView):
         super().__init__(timeout=120)
         self._guild = guild
         self._school = school
+        # selectors do not depend on the school's state, they are built only once
+        self._thread_row: ui.ActionRow = ui.ActionRow(SchoolThreadSelector(school))
+        self._referent_row: ui.ActionRow = ui.ActionRow(
+            SchoolReferentSelector(guild, school)
+        )
         self._refresh_settings()
 
     def _refresh_settings(self) -> Self:
         """
         Remove previous children and add fresh ones
         """
-        for child in self.children:
-            self.remove_item(child)
+        self.clear_items()
         channel: Optional[discord.Thread] = self._guild.get_any_channel(
             self._school.thread_id, discord.Thread
         )
@@ -486,6 +551,6 @@ class SchoolSettings(ui.LayoutView):
         else:
             container.add_item(ui.TextDisplay("### Référent actuel\nAucun"))
         self.add_item(container)
-        self.add_item(ui.ActionRow(SchoolThreadSelector(self._school)))
-        self.add_item(ui.ActionRow(SchoolReferentSelector(self._guild, self._school)))
+        self.add_item(self._thread_row)
+        self.add_item(self._referent_row)
         return self
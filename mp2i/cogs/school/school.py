@@ -1,5 +1,7 @@
+import asyncio
+import bisect
 import logging
-from typing import List, Optional
+from typing import Any, Dict, List, Optional, Set
 
 import discord
 from discord.app_commands import (
@@ -12,20 +14,58 @@ from discord.app_commands import (
 )
 from discord.app_commands.errors import MissingAnyRole
 from discord.ext.commands import Bot, Cog, GroupCog, guild_only
-from sqlalchemy import Result, delete, insert, select, update
+from sqlalchemy import Executable, Result, bindparam, delete, insert, select, update
 from sqlalchemy.dialects.postgresql import insert as insert_psql
 
 import mp2i.database.executor as database_executor
+from mp2i.database.models.member import MemberModel
 from mp2i.database.models.promotion import PromotionModel
 from mp2i.database.models.school import SchoolModel, SchoolType
 from mp2i.utils.discord import has_any_role, has_any_roles_predicate
 from mp2i.wrappers.guild import GuildWrapper
 from mp2i.wrappers.member import MemberWrapper
 
-from ._editor import SchoolSettings, _remove_old_referent
+from ._cache import (
+    cache_school,
+    cached_school,
+    invalidate_schools,
+    referent_users,
+    school_name_taken,
+    school_names,
+    thread_referents,
+)
+from ._editor import SchoolSettings, _referent_role, _remove_old_referent
 
 logger: logging.Logger = logging.getLogger(__name__)
 
+# built once, so lookups only bind their parameters
+_FIND_SCHOOL = (
+    select(SchoolModel)
+    .where(
+        SchoolModel.guild_id == bindparam("guild_id"),
+        SchoolModel.school_name == bindparam("name"),
+    )
+    .limit(1)
+)
+# schools of a leaving member lose their referent, resolved and updated in one query
+# (names of updated columns are reserved for parameters of an update)
+_RESET_REFERENT = (
+    update(SchoolModel)
+    .values(referent_id=None)
+    .where(
+        SchoolModel.guild_id == bindparam("guild"),
+        SchoolModel.referent_id
+        == select(MemberModel.member_id)
+        .where(
+            MemberModel.guild_id == bindparam("guild"),
+            MemberModel.user_id == bindparam("user"),
+        )
+        .scalar_subquery(),
+    )
+)
+# thread additions still running, referenced until they are done
+_thread_tasks: "Set[asyncio.Task[None]]" = set()
+
 
 async def _find_school(
     interaction: discord.Interaction, name: str, invert: bool = False
@@ -51,19 +91,19 @@ async def _find_school(
     """
     if not interaction.guild:
         return None
-    result: Optional[Result[SchoolModel]] = database_executor.execute(
-        select(SchoolModel).where(
-            SchoolModel.guild_id == interaction.guild.id,
-            SchoolModel.school_name == name,
+    if not (school := cached_school(interaction.guild.id, name)):
+        result: Optional[Result[SchoolModel]] = await database_executor.aexecute(
+            _FIND_SCHOOL, {"guild_id": interaction.guild.id, "name": name}
         )
-    )
 
-    if not result:
-        await interaction.edit_original_response(
-            content="Impossible de contacter la base de données."
-        )
-        return None
-    if (school := result.scalar_one_or_none()) and invert:
+        if not result:
+            await interaction.edit_original_response(
+                content="Impossible de contacter la base de données."
+            )
+            return None
+        if school := result.scalars().first():
+            cache_school(school)
+    if school and invert:
         await interaction.edit_original_response(
             content="Une établissement avec ce nom existe déjà."
         )
@@ -76,6 +116,34 @@ async def _find_school(
     return school
 
 
+async def _add_to_thread(channel: discord.Thread, member: discord.Member) -> None:
+    """
+    Add a member to a school's thread, retrying once a failed addition
+
+    Parameters
+    ----------
+    channel : discord.Thread
+        The school's thread
+
+    member : discord.Member
+        The member to add
+    """
+    for attempt in range(2):
+        try:
+            await channel.add_user(member)
+            return
+        except discord.HTTPException as err:
+            # a missing permission will not be granted by retrying
+            if attempt or isinstance(err, discord.Forbidden):
+                logger.error(
+                    "Could not add user %d to thread %d: %s",
+                    member.id,
+                    channel.id,
+                    err,
+                )
+                return
+
+
 async def add_member_to_school(
     interaction: discord.Interaction,
     member: MemberWrapper,
@@ -88,26 +156,34 @@ async def add_member_to_school(
     Parameters
     ----------
     interaction : discord.Interaction
-        The initial interaction that lead to this remove
+        The initial interaction that lead to this add
 
     member : MemberWrapper
         The concerned member
 
     school : SchoolModel
         The concerned school
+
+    year : Optional[int]
+        The promotion's year of the member
+
+    Returns
+    -------
+    Optional[PromotionModel]
+        The created promotion, None if it could not be created
     """
     if not interaction.guild:
-        return
+        return None
     guild: GuildWrapper = GuildWrapper(interaction.guild, fetch=False)
     if len(member.promotions) >= guild.max_promotions:
         await interaction.edit_original_response(
             content=f"Pas plus de {guild.max_promotions} promotions."
         )
-        return
+        return None
 
-    # create a new promotion, if already exists, override promotion's yead
+    # create a new promotion, if already exists, override promotion's year
     # returning promotion model
-    result: Optional[Result[PromotionModel]] = database_executor.execute(
+    result: Optional[Result[PromotionModel]] = await database_executor.aexecute(
         insert_psql(PromotionModel)
         .values(
             school_id=school.school_id,
@@ -127,7 +203,12 @@ async def add_member_to_school(
             school.thread_id, discord.Thread
         )
         if channel:
-            await channel.add_user(member._boxed)
+            # answering the command does not wait for the thread to be joined
+            task: asyncio.Task[None] = asyncio.create_task(
+                _add_to_thread(channel, member._boxed)
+            )
+            _thread_tasks.add(task)
+            task.add_done_callback(_thread_tasks.discard)
     return result.scalar()
 
 
@@ -150,6 +231,12 @@ async def remove_member_from_school(
     """
     if not interaction.guild:
         return
+    # remove promotion, with the referent in the same transaction if needed
+    statements: List[Executable] = [
+        delete(PromotionModel).where(
+            PromotionModel.promotion_id == promotion.promotion_id
+        )
+    ]
     # check if school's referent is the leaving member
     if (
         promotion.school.referent
@@ -160,23 +247,20 @@ async def remove_member_from_school(
             member.id,
             promotion.school_id,
         )
+        guild: GuildWrapper = GuildWrapper(interaction.guild, fetch=False)
         # remove referent
-        if await _remove_old_referent(
-            interaction, GuildWrapper(interaction.guild, fetch=False), promotion.school
-        ):
+        if role := await _referent_role(interaction, guild, promotion.school):
+            await _remove_old_referent(guild, promotion.school, role)
             # update database for referent
-            database_executor.execute(
+            statements.insert(
+                0,
                 update(SchoolModel)
                 .values(referent_id=None)
-                .where(SchoolModel.school_id == promotion.school_id)
+                .where(SchoolModel.school_id == promotion.school_id),
             )
 
-    # remove promotion
-    database_executor.execute(
-        delete(PromotionModel).where(
-            PromotionModel.promotion_id == promotion.promotion_id
-        )
-    )
+    if await database_executor.aexecute_many(statements) and len(statements) > 1:
+        invalidate_schools(interaction.guild.id)
 
 
 async def _autocomplete_schools_name(
@@ -200,26 +284,32 @@ async def _autocomplete_schools_name(
     """
     if not interaction.guild:
         return []
-    await interaction.response.defer()
-
-    # get school's name. limit to 20 due to discord
-    result: Optional[Result[SchoolModel]] = database_executor.execute(
-        select(SchoolModel)
-        .where(
-            SchoolModel.guild_id == interaction.guild.id,
-            SchoolModel.school_name.icontains(current),
+    # answer before the end of the autocomplete window, even if names must be loaded
+    try:
+        names = await asyncio.wait_for(school_names(interaction.guild.id), timeout=2.0)
+    except asyncio.TimeoutError:
+        logger.warning(
+            "Loading school names of guild %d timed out.", interaction.guild.id
         )
-        .order_by(SchoolModel.school_name)
-        .limit(20)
-    )
-
-    if not result:
+        return []
+    if names is None:
         return []
 
-    return [
-        Choice(name=school.school_name, value=school.school_name)
-        for school in map(lambda row: row.tuple()[0], result.all())
-    ]
+    # names starting with the input first, then names only containing it
+    current = current.casefold().strip()
+    start = bisect.bisect_left(names, (current,))
+    matches: List[str] = []
+    for folded, name in names[start:]:
+        if not folded.startswith(current) or len(matches) == 20:
+            break
+        matches.append(name)
+    for folded, name in names:
+        if len(matches) == 20:  # limit to 20 due to discord
+            break
+        if current in folded and not folded.startswith(current):
+            matches.append(name)
+
+    return [Choice(name=name, value=name) for name in matches]
 
 
 @guild_only()
@@ -279,11 +369,20 @@ class School(GroupCog, name="school", description="Gestion des établissements")
 
         await interaction.response.defer()
 
-        if await _find_school(interaction, name, True):
+        if (taken := await school_name_taken(interaction.guild.id, name)) is None:
+            await interaction.edit_original_response(
+                content="Impossible de contacter la base de données."
+            )
+            return
+        if taken:
+            await interaction.edit_original_response(
+                content="Une établissement avec ce nom existe déjà."
+            )
             return
 
-        # update database
-        database_executor.execute(
+        # update database, the unique index on the lowered name rejects a school
+        # created with the same name meanwhile
+        result: Optional[Result[Any]] = await database_executor.aexecute(
             insert(SchoolModel).values(
                 guild_id=interaction.guild.id,
                 school_name=name,
@@ -291,6 +390,12 @@ class School(GroupCog, name="school", description="Gestion des établissements")
                 thread_id=thread.id if thread else None,
             )
         )
+        if not result:
+            await interaction.edit_original_response(
+                content="Impossible de créer l'établissement."
+            )
+            return
+        invalidate_schools(interaction.guild.id)
 
         await interaction.edit_original_response(content=f"Établissement {name} créé.")
 
@@ -320,12 +425,13 @@ class School(GroupCog, name="school", description="Gestion des établissements")
             return
 
         # update database
-        database_executor.execute(
+        await database_executor.aexecute(
             delete(SchoolModel).where(
                 SchoolModel.guild_id == interaction.guild.id,
                 SchoolModel.school_id == school.school_id,
             )
         )
+        invalidate_schools(interaction.guild.id)
 
         await interaction.edit_original_response(
             content=f"Établissement {school.school_name} supprimé."
@@ -473,19 +579,16 @@ class School(GroupCog, name="school", description="Gestion des établissements")
             return
 
         member_wrapper: MemberWrapper = MemberWrapper(member)
-        promotions: List[PromotionModel] = list(
-            filter(
-                lambda prom: prom.school_id == school.school_id,
-                member_wrapper.promotions,
-            )
+        promotion: Optional[PromotionModel] = member_wrapper.promotion_for_school(
+            school.school_id
         )
-        if len(promotions) == 0:
+        if not promotion:
             await interaction.edit_original_response(
                 content="Ne fait pas partie de l'établissement."
             )
             return
 
-        await remove_member_from_school(interaction, member_wrapper, promotions[0])
+        await remove_member_from_school(interaction, member_wrapper, promotion)
 
         if interaction.user.id == member.id:
             logger.info(
@@ -522,13 +625,15 @@ class School(GroupCog, name="school", description="Gestion des établissements")
         member : discord.Member
             The school's referent
         """
-        member: MemberWrapper = MemberWrapper(guild_member)
-
-        database_executor.execute(
-            update(SchoolModel)
-            .values(referent_id=None)
-            .where(SchoolModel.referent_id == member.member_id)
+        # most leaving members are referent of no school, nothing to update then
+        referents: Optional[Set[int]] = await referent_users(guild_member.guild.id)
+        if referents is not None and guild_member.id not in referents:
+            return
+        await database_executor.aexecute(
+            _RESET_REFERENT,
+            {"guild": guild_member.guild.id, "user": guild_member.id},
         )
+        invalidate_schools(guild_member.guild.id)
 
     async def attach_message(
         self, interaction: discord.Interaction, message: discord.Message
@@ -547,31 +652,19 @@ class School(GroupCog, name="school", description="Gestion des établissements")
         if not interaction.guild:
             return
         await interaction.response.defer(ephemeral=True)
-        result: Optional[Result[SchoolModel]] = database_executor.execute(
-            select(SchoolModel).where(
-                SchoolModel.guild_id == interaction.guild.id,
-                SchoolModel.thread_id == message.channel.id,
-            )
+        # is the member referent of a school whose thread is where interaction takes place
+        referents: Optional[Dict[int, Set[int]]] = await thread_referents(
+            interaction.guild.id
         )
 
-        if not result:
+        if referents is None:
             logger.error("Could not contact database.")
             await interaction.edit_original_response(
                 content="Impossible de vérifier que vous êtes apte à faire cette action"
             )
             return
 
-        # get schools for which the member is referent
-        matching_school: List[SchoolModel] = list(
-            filter(
-                lambda school: (
-                    school.referent and school.referent.user_id == interaction.user.id
-                ),
-                map(lambda row: row.tuple()[0], result.all()),
-            )
-        )
-        # member is referent for a school that its thread is where interaction takes place
-        if len(matching_school) == 0:
+        if interaction.user.id not in referents.get(message.channel.id, ()):
             await interaction.edit_original_response(
                 content="Vous ne pouvez pas (dés)épingler un message dans ce salon"
             )
@@ -1,32 +1,134 @@
-from typing import Any, List, Optional, Tuple
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
 import discord
 import discord.ui as ui
 from discord.app_commands import autocomplete, command, describe, guild_only, rename
 from discord.ext.commands import Bot, Cog
 from discord.member import Member
-from sqlalchemy import Executable, Result, select
+from sqlalchemy import Result, bindparam, func, select
 
 import mp2i.database.executor as database_executor
 from mp2i.database.models.member import MemberModel
 from mp2i.database.models.promotion import PromotionModel
-from mp2i.database.models.school import SchoolModel, SchoolType
+from mp2i.database.models.school import SchoolType
 from mp2i.utils.paginator import ComponentsPaginator
 
+from ._cache import school_referents
 from .school import _autocomplete_schools_name, _find_school
 
+# user ids and names of the members of a school still in the guild, other than the
+# referent, with their latest promotion's year, built once; the presence flag kept by
+# member registration replaces the former check against the guild cache so that the
+# count and the pages come from the same query
+_SCHOOL_MEMBERS = (
+    select(
+        MemberModel.user_id,
+        MemberModel.display_name,
+        func.max(PromotionModel.promotion_year),
+    )
+    .join(PromotionModel, PromotionModel.member_id == MemberModel.member_id)
+    .where(
+        PromotionModel.school_id == bindparam("school_id"),
+        MemberModel.presence.is_(True),
+        MemberModel.member_id.is_distinct_from(bindparam("referent_id")),
+    )
+    .group_by(MemberModel.member_id)
+)
+_COUNT_SCHOOL_MEMBERS = select(func.count()).select_from(_SCHOOL_MEMBERS.subquery())
+_SCHOOL_MEMBERS_PAGE = (
+    _SCHOOL_MEMBERS.order_by(MemberModel.user_id)
+    .offset(bindparam("offset"))
+    .limit(bindparam("limit"))
+)
+
+
+def _member_text(name: str, mention: str, year: Optional[int]) -> str:
+    """
+    Describe a member of a school
+
+    Parameters
+    ----------
+    name : str
+        the member's name
+
+    mention : str
+        the member's mention
+
+    year : Optional[int]
+        the member's promotion year in the school
+
+    Returns
+    -------
+    str
+        the member's name and mention, followed by the year if known
+    """
+    return f" `{name}`・{mention}" + (f"・{year}" if year else "")
+
 
 class SchoolCmdUtils(Cog):
     """
     Some useful command for schools
     """
 
-    def _get_emoji_by_status(self, member: discord.Member) -> Optional[discord.Emoji]:
+    def __init__(self) -> None:
+        """
+        Prepare the cache of guilds' emojis by name
+        """
+        self._emojis: Dict[int, Dict[str, discord.Emoji]] = {}
+
+    def _guild_emojis(self, guild: discord.Guild) -> Dict[str, discord.Emoji]:
+        """
+        Get emojis of a guild by name, indexed once until they are updated
+
+        Parameters
+        ----------
+        guild : discord.Guild
+            the concerned guild
+
+        Return
+        ------
+        Dict[str, discord.Emoji]
+            the guild's emojis by name
+        """
+        if (emojis := self._emojis.get(guild.id)) is None:
+            emojis = {emoji.name: emoji for emoji in guild.emojis}
+            self._emojis[guild.id] = emojis
+        return emojis
+
+    @Cog.listener("on_guild_emojis_update")
+    async def on_emojis_update(
+        self,
+        guild: discord.Guild,
+        before: Sequence[discord.Emoji],
+        after: Sequence[discord.Emoji],
+    ) -> None:
+        """
+        Forget the indexed emojis of a guild when they change
+
+        Parameters
+        ----------
+        guild : discord.Guild
+            the guild whose emojis have been updated
+
+        before : Sequence[discord.Emoji]
+            emojis before the update
+
+        after : Sequence[discord.Emoji]
+            emojis after the update
+        """
+        self._emojis.pop(guild.id, None)
+
+    def _get_emoji_by_status(
+        self, emojis: Dict[str, discord.Emoji], member: discord.Member
+    ) -> Optional[discord.Emoji]:
         """
         Get emoji from member's status
 
         Parameters
         ----------
+        emojis : Dict[str, discord.Emoji]
+            the guild's emojis by name
+
         member : discord.Member
             the concerned member
 
@@ -36,7 +138,7 @@ class SchoolCmdUtils(Cog):
             the emoji if exists
         """
         # found emojis by name of the member's status
-        return discord.utils.get(member.guild.emojis, name=member.status.name)
+        return emojis.get(member.status.name)
 
     @command(name="members", description="Affiche la liste des membres d'une école")
     @describe(name="Nom de l'établissement")
@@ -63,49 +165,70 @@ class SchoolCmdUtils(Cog):
         if not (school := await _find_school(interaction, name)):
             return
 
-        # find members and their promotion's year of the school
-        result: Optional[Result[MemberModel]] = database_executor.execute(
-            select(MemberModel)
-            .add_columns(PromotionModel.promotion_year)
-            .join(PromotionModel, full=True)
-            .where(PromotionModel.school_id == school.school_id)
-            .distinct()
+        parameters: Dict[str, Any] = {
+            "school_id": school.school_id,
+            "referent_id": school.referent_id,
+        }
+        # count members of the school, pages are loaded when displayed
+        result: Optional[Result[Tuple[int]]] = await database_executor.aexecute(
+            _COUNT_SCHOOL_MEMBERS, parameters
         )
         if not result:
-            await interaction.response.send_message(
-                "Impossible de récupérer la base de données."
+            await interaction.edit_original_response(
+                content="Impossible de récupérer la base de données."
             )
             return
+        count: int = result.scalar_one()
 
-        # map membermodel to guild's member
-        members: List[Tuple[MemberModel, Optional[Member], int]] = list(
-            map(
-                lambda model: (model[0], guild.get_member(model[0].user_id), model[1]),
-                result.all(),
+        async def fetch_entries(offset: int, limit: int) -> List[ui.Item[Any]]:
+            page: Optional[Result[Tuple[int, str, Optional[int]]]] = (
+                await database_executor.aexecute(
+                    _SCHOOL_MEMBERS_PAGE,
+                    {**parameters, "offset": offset, "limit": limit},
+                )
             )
-        )
+            if not page:
+                return []
+            entries: List[ui.Item[Any]] = []
+            for user_id, display_name, year in page:
+                # one entry per row, members missing from the cache keep their
+                # registered name so that every page is full
+                member: Optional[Member] = guild.get_member(user_id)
+                entries.append(
+                    ui.TextDisplay(
+                        _member_text(member.name, member.mention, year)
+                        if member
+                        else _member_text(display_name, f"<@{user_id}>", year)
+                    )
+                )
+            return entries
+
         title: str = "## Membres de l'établissement " + school.school_name
-        # retrieve referent while looping of all members
-        referent: Optional[str] = None
-        entries: List[ui.Item[Any]] = []
-        for model, member, year in members:
-            if not member:
-                continue
-            text: str = f" `{member.name}`・{member.mention}" + (f"・{year}" if year else "")
-            # looking at referent
-            if model.member_id == school.referent_id:
-                referent = text + f" {self._get_emoji_by_status(member)}"
-                continue
-            entries.append(ui.TextDisplay(text))
-
-        title += f"\n**Nombre d'étudiants** {len(entries) + (1 if referent else 0)}"
-        if referent:
-            title += f"\n**Référent** {referent}"
+        # referent is displayed in the title, with its year in the school
+        referent: Optional[Member] = None
+        if school.referent:
+            referent = guild.get_member(school.referent.user_id)
+        title += f"\n**Nombre d'étudiants** {count + (1 if referent else 0)}"
+        if referent and school.referent:
+            years: List[int] = [
+                promotion.promotion_year
+                for promotion in school.referent.promotions
+                if promotion.school_id == school.school_id and promotion.promotion_year
+            ]
+            emoji: Optional[discord.Emoji] = self._get_emoji_by_status(
+                self._guild_emojis(guild), referent
+            )
+            text: str = _member_text(
+                referent.name, referent.mention, max(years, default=None)
+            )
+            title += f"\n**Référent** {text} {emoji}"
 
         await ComponentsPaginator(
             author=interaction.user.id,
             title=title,
-            entries=entries,
+            entries=[],
+            fetcher=fetch_entries,
+            count=count,
         ).send(interaction)
 
     @command(name="referents", description="Affiche la liste des référents")
@@ -130,39 +253,25 @@ class SchoolCmdUtils(Cog):
             return
         await interaction.response.defer()
 
-        statement: Executable = select(SchoolModel).where(
-            SchoolModel.guild_id == guild.id, SchoolModel.referent
-        )
-        if type:
-            statement = statement.where(SchoolModel.school_type == type)
-
-        result: Optional[Result[SchoolModel]] = database_executor.execute(
-            statement.order_by(SchoolModel.school_name)
+        referents: Optional[List[Tuple[str, SchoolType, int]]] = await school_referents(
+            guild.id
         )
-
-        if not result:
-            await interaction.response.send_message(
-                "Impossible de récupérer la base de données."
+        if referents is None:
+            await interaction.edit_original_response(
+                content="Impossible de récupérer la base de données."
             )
             return
 
-        # get discord's member from school's referent id
-        schools: List[Tuple[SchoolModel, Optional[discord.Member]]] = list(
-            map(
-                lambda school: (school, guild.get_member(school.referent.user_id)),
-                result.scalars(),
-            )
-        )
-
-        entries: List[ui.Item[Any]] = []
-        for school, member in schools:
-            if not member:
-                continue
-            entries.append(
-                ui.TextDisplay(
-                    f" * **{school.school_name}**・{member.mention}・`{member.name}` {self._get_emoji_by_status(member)}"
-                )
+        # get discord's member from school's referent id, skipping those who left
+        emojis: Dict[str, discord.Emoji] = self._guild_emojis(guild)
+        entries: List[ui.Item[Any]] = [
+            ui.TextDisplay(
+                f" * **{school_name}**・{member.mention}・`{member.name}` {self._get_emoji_by_status(emojis, member)}"
             )
+            for school_name, school_type, user_id in referents
+            if (not type or school_type == type)
+            and (member := guild.get_member(user_id))
+        ]
         await ComponentsPaginator(
             author=interaction.user.id,
             title=f"## Référents {type.value if type else ''}",
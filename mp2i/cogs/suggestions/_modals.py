@@ -1,4 +1,4 @@
-from typing import Any, Callable, Optional
+from typing import Any, Awaitable, Callable, Optional
 
 import discord
 import discord.ui as ui
@@ -70,7 +70,8 @@ class SuggestionCloseModal(ui.Modal):
         self,
         suggestion: SuggestionModel,
         callback: Callable[
-            [SuggestionModel, discord.Member, SuggestionStatus, Optional[str]], Any
+            [SuggestionModel, discord.Member, SuggestionStatus, Optional[str]],
+            Awaitable[bool],
         ],
     ) -> None:
         """
@@ -81,7 +82,7 @@ class SuggestionCloseModal(ui.Modal):
         suggestion : SuggestionModel
             The concerned suggestion
 
-        callback : Callable[[SuggestionModel, discord.Member, SuggestionStatus, Optional[str]], Any]
+        callback : Callable[[SuggestionModel, discord.Member, SuggestionStatus, Optional[str]], Awaitable[bool]]
             Function to call for closing a suggestion
         """
         super().__init__(title="Clôturer une suggestion")
@@ -121,10 +122,16 @@ class SuggestionCloseModal(ui.Modal):
         await interaction.response.send_message(
             "Suggestion en cours de fermeture.", ephemeral=True
         )
-        await self._callback(
+        closed: bool = await self._callback(
             self._suggestion,
             interaction.user,
             SuggestionStatus[self._status.values[0]],
             self._reason.value,
         )
-        await interaction.edit_original_response(content="Suggestion fermée.")
+        await interaction.edit_original_response(
+            content=(
+                "Suggestion fermée."
+                if closed
+                else "Suggestion introuvable ou déjà traitée."
+            )
+        )
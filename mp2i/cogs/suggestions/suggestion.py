@@ -1,8 +1,10 @@
+import asyncio
 import datetime
+import io
 import logging
 import re
 from pathlib import Path
-from typing import Any, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 import discord
 import discord.ui as ui
@@ -16,7 +18,7 @@ from discord.app_commands import (
 )
 from discord.enums import SeparatorSpacing
 from discord.ext.commands import Bot, Cog, GroupCog
-from sqlalchemy import Executable, Result, insert, select, update
+from sqlalchemy import Executable, Result, bindparam, insert, select, update
 
 import mp2i.database.executor as database_executor
 from mp2i.database.models.member import MemberModel
@@ -31,6 +33,62 @@ from ._modals import SuggestionCloseModal, SuggestionCreateModal
 
 logger: logging.Logger = logging.getLogger(__name__)
 
+# open suggestions of a guild, found by id or by message (the id of their thread)
+_OPEN_SUGGESTION = select(SuggestionModel).where(
+    SuggestionModel.guild_id == bindparam("guild_id"),
+    SuggestionModel.suggestion_status == SuggestionStatus.OPEN,
+)
+_OPEN_SUGGESTION_BY_ID = _OPEN_SUGGESTION.where(
+    SuggestionModel.suggestion_id == bindparam("suggestion_id")
+)
+_OPEN_SUGGESTION_BY_MESSAGE = _OPEN_SUGGESTION.where(
+    SuggestionModel.suggestion_message == bindparam("message_id")
+)
+# close an open suggestion, resolving the staff and returning the author's user id
+# (names of updated columns are reserved for parameters of an update)
+_CLOSE_SUGGESTION = (
+    update(SuggestionModel)
+    .values(
+        suggestion_status=bindparam("status"),
+        staff_id=select(MemberModel.member_id)
+        .where(
+            MemberModel.guild_id == bindparam("guild"),
+            MemberModel.user_id == bindparam("staff"),
+        )
+        .scalar_subquery(),
+        staff_description=bindparam("reason"),
+        suggestion_handled_date=bindparam("handled_date"),
+    )
+    .where(
+        SuggestionModel.guild_id == bindparam("guild"),
+        SuggestionModel.suggestion_id == bindparam("suggestion"),
+        SuggestionModel.suggestion_status == SuggestionStatus.OPEN,
+    )
+    .returning(
+        select(MemberModel.user_id)
+        .where(MemberModel.member_id == SuggestionModel.author_id)
+        .scalar_subquery()
+    )
+)
+
+
+async def _add_vote(message: discord.Message, emoji: str) -> None:
+    """
+    Add a vote reaction to a suggestion message
+
+    Parameters
+    ----------
+    message : discord.Message
+        The suggestion message
+
+    emoji : str
+        The emoji of the vote
+    """
+    try:
+        await message.add_reaction(emoji)
+    except discord.errors.NotFound:
+        pass
+
 
 @guild_only
 class Suggestions(GroupCog, name="suggestions", description="Gestion des suggestions"):
@@ -40,38 +98,29 @@ class Suggestions(GroupCog, name="suggestions", description="Gestion des suggest
 
     def __init__(self) -> None:
         """
-        Initialize common strings
+        Initialize common strings and the logo, read once from static files
         """
         self._process: str = get_text_from_static_file("text/suggestion/process.md")
         self._answer: str = get_text_from_static_file("text/suggestion/answer.md")
-        self._image: Path = get_static_file_path("img/logo.png")
+        image: Path = get_static_file_path("img/logo.png")
+        self._image_name: str = image.name
+        self._image: bytes = image.read_bytes()
 
-    async def _send_process(self, guild: discord.Guild) -> None:
+    def _build_process_view(self) -> ui.LayoutView:
         """
-        Send the main message for suggestions
+        Build the view of the main message for suggestions
 
-        Parameters
-        ----------
-        guild : discord.Guild
-            The concerned guild
+        Returns
+        -------
+        ui.LayoutView
+            The view, built for each message so that it expires from the view store
         """
-        guild_wrapper: GuildWrapper = GuildWrapper(guild)
-        channel: Optional[discord.TextChannel] = guild_wrapper.suggestions_channel
-        if not channel:
-            return
-        # get previous suggestions instruction and delete it if exists
-        past_message: Optional[
-            discord.Message
-        ] = await guild_wrapper.suggestions_message
-        if past_message:
-            await past_message.delete()
         container: ui.Container = ui.Container()
 
-        filename = self._image.name
         section = ui.Section(
             ui.TextDisplay(self._process),
             # `attachment://` is required
-            accessory=ui.Thumbnail(media=f"attachment://{filename}"),
+            accessory=ui.Thumbnail(media=f"attachment://{self._image_name}"),
         )
         container.add_item(section)
         container.add_item(ui.Separator())
@@ -84,12 +133,35 @@ class Suggestions(GroupCog, name="suggestions", description="Gestion des suggest
                 )
             )
         )
+        # clicks are handled by the on_interaction listener, the view is not kept
         view: ui.LayoutView = ui.LayoutView()
         view.add_item(container)
+        return view
 
+    async def _send_process(self, guild: discord.Guild) -> None:
+        """
+        Send the main message for suggestions
+
+        Parameters
+        ----------
+        guild : discord.Guild
+            The concerned guild
+        """
+        guild_wrapper: GuildWrapper = GuildWrapper(guild)
+        channel: Optional[discord.TextChannel] = guild_wrapper.suggestions_channel
+        if not channel:
+            return
+        # get previous suggestions instruction and delete it if exists
+        past_message: Optional[
+            discord.Message
+        ] = await guild_wrapper.suggestions_message
+        if past_message:
+            await past_message.delete()
         # add file (previous Thumbnail) in attachment to message
-        file = discord.File(self._image, filename=filename)
-        new_message: discord.Message = await channel.send(view=view, files=[file])
+        file = discord.File(io.BytesIO(self._image), filename=self._image_name)
+        new_message: discord.Message = await channel.send(
+            view=self._build_process_view(), files=[file]
+        )
         guild_wrapper.suggestions_message = new_message
 
     def _get_components_for_default_container(
@@ -180,20 +252,19 @@ class Suggestions(GroupCog, name="suggestions", description="Gestion des suggest
         view.add_item(container)
         # send message
         message: discord.Message = await channel.send(view=view)
-        try:
-            # add emojis to the message
-            await message.add_reaction("✅")
-            await message.add_reaction("❌")
-        except discord.errors.NotFound:
-            pass
-        # create thread from the message
-        thread: discord.Thread = await channel.create_thread(
-            name=title, message=message, auto_archive_duration=10080
+        # add emojis to the message and create thread from it at the same time
+        thread: discord.Thread
+        _, _, thread = await asyncio.gather(
+            _add_vote(message, "✅"),
+            _add_vote(message, "❌"),
+            channel.create_thread(
+                name=title, message=message, auto_archive_duration=10080
+            ),
         )
         await thread.add_user(author)
         author_wrapper: MemberWrapper = MemberWrapper(author)
         # update database
-        database_executor.execute(
+        await database_executor.aexecute(
             insert(SuggestionModel).values(
                 guild_id=guild.id,
                 author_id=author_wrapper.member_id,
@@ -212,7 +283,7 @@ class Suggestions(GroupCog, name="suggestions", description="Gestion des suggest
         staff: discord.Member,
         status: SuggestionStatus,
         reason: Optional[str] = None,
-    ) -> None:
+    ) -> bool:
         """
         Close a suggestion
 
@@ -229,6 +300,12 @@ class Suggestions(GroupCog, name="suggestions", description="Gestion des suggest
 
         reason : Optional[str]
             The reason of the closing, can be None
+
+        Returns
+        -------
+        bool
+            True if the suggestion has been closed, False if it was not open anymore
+            or could not be found
         """
         guild: GuildWrapper = GuildWrapper(staff.guild, fetch=False)
         # get suggestion thread
@@ -236,39 +313,67 @@ class Suggestions(GroupCog, name="suggestions", description="Gestion des suggest
             suggestion.suggestion_message, discord.Thread
         )
         if not thread or not isinstance(thread.parent, discord.TextChannel):
-            return
-        # get message
-        message: discord.Message = await thread.parent.fetch_message(thread.id)
+            return False
+        now: datetime.datetime = datetime.datetime.now()
+        # update database only if still open, another staff may have closed it
+        # since the modal has been opened, and get the author in the same query
+        closed: Optional[Result[Tuple[Optional[int]]]] = (
+            await database_executor.aexecute(
+                _CLOSE_SUGGESTION,
+                {
+                    "guild": guild.id,
+                    "suggestion": suggestion.suggestion_id,
+                    "staff": staff.id,
+                    "status": status,
+                    "reason": reason,
+                    "handled_date": now,
+                },
+            )
+        )
+        if not closed or not (row := closed.one_or_none()):
+            return False
+        (author_user_id,) = row
+        # the suggestion is closed from now on, discord errors must not stop the
+        # rest of the closing
+        message: Optional[discord.Message] = None
+        try:
+            message = await thread.parent.fetch_message(thread.id)
+        except discord.HTTPException as err:
+            logger.warning(
+                "Could not fetch message of suggestion %d: %s",
+                suggestion.suggestion_id,
+                err,
+            )
         # get member that create the suggestion may not be present anymore
-        author_res: Optional[Result[MemberModel]] = database_executor.execute(
-            select(MemberModel).where(MemberModel.member_id == suggestion.author_id)
+        author_member: Optional[discord.Member] = (
+            staff.guild.get_member(author_user_id) if author_user_id else None
         )
-        author_member: Optional[discord.Member] = None
-        if author_res and (author := author_res.scalar_one_or_none()):
-            author_member = await staff.guild.fetch_member(author.user_id)
+        if author_member:
             answer: str = self._answer
             answer = re.sub(
                 f"<reason>{'[^<]*' if not reason else '|'}</reason>", "", answer
             )
 
             # inform suggestion's author that suggestion is closed
-            await thread.send(
-                answer.format(
-                    author=f"<@{author.user_id}>",
-                    status=status.result,
-                    message=message.jump_url,
+            try:
+                await thread.send(
+                    answer.format(
+                        author=author_member.mention,
+                        status=status.result,
+                        message=thread.parent.get_partial_message(thread.id).jump_url,
+                    )
                 )
-            )
-        # count number of pros
-        accept: int = getattr(
-            discord.utils.get(message.reactions, emoji="✅"), "count", 0
-        )
-        # count number of cons
-        decline: int = getattr(
-            discord.utils.get(message.reactions, emoji="❌"), "count", 0
-        )
-
-        now: datetime.datetime = datetime.datetime.now()
+            except discord.HTTPException as err:
+                logger.warning(
+                    "Could not answer suggestion %d: %s", suggestion.suggestion_id, err
+                )
+        # count number of pros and cons, reactions may have been cleared
+        votes: Dict[str, int] = {
+            str(reaction.emoji): reaction.count
+            for reaction in (message.reactions if message else [])
+        }
+        accept: int = votes.get("✅", 0)
+        decline: int = votes.get("❌", 0)
 
         # create a new suggestion message with staff result
         container: ui.Container = ui.Container()
@@ -293,28 +398,29 @@ class Suggestions(GroupCog, name="suggestions", description="Gestion des suggest
         container.accent_colour = status.colour
         view: ui.LayoutView = ui.LayoutView()
         view.add_item(container)
-        # edit suggestion message with the new container
-        await message.edit(view=view, embeds=[])
-        # remove reactions
-        await message.clear_reactions()
-
-        # update database
-        database_executor.execute(
-            update(SuggestionModel)
-            .values(
-                suggestion_status=status,
-                staff_id=MemberWrapper(staff).member_id,
-                staff_description=reason,
-                suggestion_handled_date=datetime.datetime.now(),
-            )
-            .where(
-                SuggestionModel.guild_id == guild.id,
-                SuggestionModel.suggestion_id == suggestion.suggestion_id,
-            )
-        )
+        if message:
+            try:
+                # edit suggestion message with the new container
+                await message.edit(view=view, embeds=[])
+                # remove reactions
+                await message.clear_reactions()
+            except discord.HTTPException as err:
+                logger.warning(
+                    "Could not update message of suggestion %d: %s",
+                    suggestion.suggestion_id,
+                    err,
+                )
 
         # lock and archive suggestion thread
-        await thread.edit(locked=True, archived=True)
+        try:
+            await thread.edit(locked=True, archived=True)
+        except discord.HTTPException as err:
+            logger.warning(
+                "Could not archive thread of suggestion %d: %s",
+                suggestion.suggestion_id,
+                err,
+            )
+        return True
 
     async def _autocomplete_suggestions_titles(
         self, interaction: discord.Interaction, current: str
@@ -337,10 +443,9 @@ class Suggestions(GroupCog, name="suggestions", description="Gestion des suggest
         """
         if not interaction.guild:
             return []
-        await interaction.response.defer()
 
         # get open suggestions. limit to 20 due to discord
-        result: Optional[Result[SuggestionModel]] = database_executor.execute(
+        result: Optional[Result[SuggestionModel]] = await database_executor.aexecute(
             select(SuggestionModel)
             .where(
                 SuggestionModel.guild_id == interaction.guild.id,
@@ -393,7 +498,9 @@ class Suggestions(GroupCog, name="suggestions", description="Gestion des suggest
                 SuggestionModel.suggestion_status == status,
             )
 
-        result: Optional[Result[SuggestionModel]] = database_executor.execute(statement)
+        result: Optional[Result[SuggestionModel]] = await database_executor.aexecute(
+            statement
+        )
 
         if not result:
             await interaction.response.send_message(
@@ -407,23 +514,21 @@ class Suggestions(GroupCog, name="suggestions", description="Gestion des suggest
             title: ui.TextDisplay = ui.TextDisplay(
                 f"**{suggestion.suggestion_title}** ({suggestion.suggestion_status.result})"
             )
-            try:
-                message: discord.Message = await channel.fetch_message(
-                    suggestion.suggestion_message
-                )
-                entries.append(
-                    ui.Section(
-                        title,
-                        # button to jump to the suggestion
-                        accessory=ui.Button(
-                            style=discord.ButtonStyle.link,
-                            label="Voir",
-                            url=message.jump_url,
-                        ),
-                    )
+            # link is built locally, suggestion messages are in the suggestions channel
+            message: discord.PartialMessage = channel.get_partial_message(
+                suggestion.suggestion_message
+            )
+            entries.append(
+                ui.Section(
+                    title,
+                    # button to jump to the suggestion
+                    accessory=ui.Button(
+                        style=discord.ButtonStyle.link,
+                        label="Voir",
+                        url=message.jump_url,
+                    ),
                 )
-            except discord.NotFound:
-                entries.append(title)
+            )
 
         await ComponentsPaginator(
             author=interaction.user.id,
@@ -471,44 +576,27 @@ class Suggestions(GroupCog, name="suggestions", description="Gestion des suggest
         """
         if not interaction.channel_id or not interaction.guild:
             return
-        result: Optional[Result[SuggestionModel]] = None
-        suggestion: Optional[SuggestionModel] = None
-        # close suggestion by id
-        if suggestion_id:
-            try:
-                result = database_executor.execute(
-                    select(SuggestionModel).where(
-                        SuggestionModel.guild_id == interaction.guild.id,
-                        SuggestionModel.suggestion_id == int(suggestion_id),
-                        SuggestionModel.suggestion_status == SuggestionStatus.OPEN,
-                    )
-                )
-                if result:
-                    suggestion = result.scalar_one_or_none()
-                else:
-                    await interaction.response.send_message(
-                        "Aucune réponse de la base de données."
-                    )
-                    return
-            except Exception:
-                pass
-        # close suggestion with current thread's id
+        # close suggestion by id, or with current thread's id
+        statement: Executable = _OPEN_SUGGESTION_BY_MESSAGE
+        parameters: Dict[str, int] = {
+            "guild_id": interaction.guild.id,
+            "message_id": interaction.channel_id,
+        }
+        if suggestion_id and suggestion_id.isdigit():
+            statement = _OPEN_SUGGESTION_BY_ID
+            parameters = {
+                "guild_id": interaction.guild.id,
+                "suggestion_id": int(suggestion_id),
+            }
+        result: Optional[Result[SuggestionModel]] = await database_executor.aexecute(
+            statement, parameters
+        )
         if not result:
-            result = database_executor.execute(
-                select(SuggestionModel).where(
-                    SuggestionModel.guild_id
-                    == interaction.guild.id,  # not required in the absolute due to suggestion_message
-                    SuggestionModel.suggestion_message == interaction.channel_id,
-                    SuggestionModel.suggestion_status == SuggestionStatus.OPEN,
-                )
+            await interaction.response.send_message(
+                "Aucune réponse de la base de données."
             )
-            if result:
-                suggestion = result.scalar_one_or_none()
-            else:
-                await interaction.response.send_message(
-                    "Aucune réponse de la base de données."
-                )
-                return
+            return
+        suggestion: Optional[SuggestionModel] = result.scalar_one_or_none()
         # neither id nor thread lead to a valid suggestion
         if not suggestion:
             await interaction.response.send_message("Aucune suggestion trouvée.")
@@ -4,13 +4,28 @@ from typing import Optional
 
 from sqlalchemy import create_engine
 from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
 
 logger: Logger = getLogger(__name__)
 engine: Optional[Engine] = None
+async_engine: Optional[AsyncEngine] = None
 
 if __database_url := os.getenv("MP2I__DATABASE_URL"):
     try:
-        engine = create_engine(__database_url.strip())
+        # compiled forms of the statements are cached per engine, keep enough of them
+        engine = create_engine(
+            __database_url.strip(),
+            insertmanyvalues_page_size=500,
+            query_cache_size=1200,
+        )
+        # same url, the async variant of the driver is picked by SQLAlchemy
+        async_engine = create_async_engine(
+            __database_url.strip(),
+            insertmanyvalues_page_size=500,
+            query_cache_size=1200,
+            pool_size=10,
+            max_overflow=20,
+        )
     except ImportError as err:
         logger.fatal(
             f"Could not create a database engine due to an import error: {err}"
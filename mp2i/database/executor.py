@@ -1,11 +1,13 @@
 import logging
-from typing import Any, Optional
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, List, Optional, Sequence
 
 from sqlalchemy import Executable
 from sqlalchemy.engine import Result
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm.session import Session
 
-from . import engine
+from . import async_engine, engine
 
 logger: logging.Logger = logging.getLogger(__name__)
 
@@ -41,3 +43,97 @@ def execute(statement: Executable, *args: Any) -> Optional[Result[Any]]:
         except Exception as err:
             logger.fatal(f"Could not execute statement: {err}")
     return None
+
+
+async def aexecute(statement: Executable, *args: Any) -> Optional[Result[Any]]:
+    """
+    Execute SQL statement in an asynchronous session without blocking the event loop
+
+    Parameters
+    ----------
+    statement : Executable
+        statement to execute
+    args : Tuple[Any]
+        query's arguments
+
+    Returns
+    -------
+    Optional[Result[Any]]
+        Potential answer from the database
+    """
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        try:
+            result: Result[Any] = await session.execute(
+                statement, *args, execution_options={"prebuffer_rows": True}
+            )
+            try:
+                await session.commit()
+                return result
+            except Exception as err:
+                await session.rollback()
+                logger.fatal(f"Could not commit query: {err}")
+                return None
+        except Exception as err:
+            logger.fatal(f"Could not execute statement: {err}")
+    return None
+
+
+async def aexecute_many(
+    statements: Sequence[Executable],
+) -> Optional[List[Result[Any]]]:
+    """
+    Execute SQL statements in a single asynchronous session, committed together
+
+    Parameters
+    ----------
+    statements : Sequence[Executable]
+        statements to execute in order
+
+    Returns
+    -------
+    Optional[List[Result[Any]]]
+        Potential answers from the database, None if nothing has been committed
+    """
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        try:
+            results: List[Result[Any]] = [
+                await session.execute(
+                    statement, execution_options={"prebuffer_rows": True}
+                )
+                for statement in statements
+            ]
+            try:
+                await session.commit()
+                return results
+            except Exception as err:
+                await session.rollback()
+                logger.fatal(f"Could not commit queries: {err}")
+                return None
+        except Exception as err:
+            logger.fatal(f"Could not execute statements: {err}")
+    return None
+
+
+@asynccontextmanager
+async def transaction() -> AsyncIterator[AsyncSession]:
+    """
+    Open an asynchronous session whose statements are committed together
+
+    Yields
+    ------
+    AsyncSession
+        Session in which statements are executed, committed on exit or rolled back
+        if an exception has been raised
+
+    Raises
+    ------
+    Exception
+        Any error raised while executing statements or committing them
+    """
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        try:
+            async with session.begin():
+                yield session
+        except Exception as err:
+            logger.fatal(f"Could not commit transaction: {err}")
+            raise
@@ -8,6 +8,7 @@ from sqlalchemy import (
     DateTime,
     Enum,
     ForeignKey,
+    Index,
     Sequence,
 )
 from sqlalchemy.orm import Mapped, mapped_column, relationship
@@ -28,13 +29,29 @@ class SanctionType(PyEnum):
     BAN = ("BAN", 0xFF0000)
     UNBAN = ("DEBAN", 0xFA9C1B)
 
-    @property
-    def get_colour(self) -> int:
-        return self.value[1]
+    def __init__(self, label: str, colour: int) -> None:
+        # plain attributes set once per member, no descriptor call on each read
+        self.label: str = label
+        self.get_colour: int = colour
 
 
 class SanctionModel(Base):
     __tablename__ = "sanctions"
+    __table_args__ = (
+        # serve the listing filters and its ORDER BY sanction_id DESC from the index
+        Index(
+            "idx_sanction_guild_victim_type",
+            "guild_id",
+            "victim_id",
+            "sanction_type",
+            "sanction_id",
+        ),
+        Index("idx_sanction_guild_type", "guild_id", "sanction_type", "sanction_id"),
+        # unfiltered listing of a guild
+        Index("idx_sanction_guild", "guild_id", "sanction_id"),
+        # cascades when a member is deleted
+        Index("idx_sanction_victim", "victim_id"),
+    )
 
     sanction_id: Mapped[int] = mapped_column(
         BigInteger(),
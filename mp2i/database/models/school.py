@@ -9,6 +9,8 @@ from sqlalchemy import (
     Index,
     Sequence,
     UniqueConstraint,
+    func,
+    literal_column,
 )
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
@@ -35,9 +37,19 @@ class SchoolModel(Base):
     """
 
     __tablename__ = "schools"
-    __tableargs__ = (
+    __table_args__ = (
+        # its index already serves the per guild lookups by exact name
         UniqueConstraint("guild_id", "school_name"),
-        Index("idx_school_name", "school_name"),
+        # names are unique per guild ignoring case, enforced by the database; as an
+        # index it is also created on databases older than the constraint above
+        Index(
+            "idx_school_guild_lower_name",
+            "guild_id",
+            func.lower(literal_column("school_name")),
+            unique=True,
+        ),
+        # schools of a leaving referent are looked up by referent
+        Index("idx_school_referent", "referent_id"),
     )
 
     school_id: Mapped[int] = mapped_column(
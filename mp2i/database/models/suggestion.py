@@ -1,8 +1,16 @@
 import datetime
 from enum import Enum as PyEnum
-from typing import Optional
-
-from sqlalchemy import VARCHAR, BigInteger, DateTime, Enum, ForeignKey, Sequence
+from typing import Dict, Optional
+
+from sqlalchemy import (
+    VARCHAR,
+    BigInteger,
+    DateTime,
+    Enum,
+    ForeignKey,
+    Index,
+    Sequence,
+)
 from sqlalchemy.orm import Mapped, mapped_column
 
 from . import Base
@@ -24,13 +32,16 @@ class SuggestionStatus(PyEnum):
 
     @property
     def result(self) -> str:
-        if self == SuggestionStatus.CLOSED:
-            return "fermée"
-        elif self == SuggestionStatus.ACCEPTED:
-            return "acceptée"
-        elif self == SuggestionStatus.REJECTED:
-            return "rejetée"
-        return "ouverte"
+        return _STATUS_RESULTS[self]
+
+
+# result of each status, as displayed to members
+_STATUS_RESULTS: Dict[SuggestionStatus, str] = {
+    SuggestionStatus.OPEN: "ouverte",
+    SuggestionStatus.CLOSED: "fermée",
+    SuggestionStatus.ACCEPTED: "acceptée",
+    SuggestionStatus.REJECTED: "rejetée",
+}
 
 
 class SuggestionModel(Base):
@@ -39,6 +50,10 @@ class SuggestionModel(Base):
     """
 
     __tablename__ = "suggestions"
+    __table_args__ = (
+        # suggestions are closed from their thread, whose id is the message's one
+        Index("idx_suggestion_message", "suggestion_message"),
+    )
 
     suggestion_id: Mapped[int] = mapped_column(
         BigInteger(),
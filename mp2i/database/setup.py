@@ -60,7 +60,34 @@ def initialize_database() -> bool:
             inspector = inspect(engine)
         else:
             logger.info("Tables already created.")
+            _create_missing_indexes(inspector)
         return inspector.has_table("guilds")
     except Exception as err:
         logger.fatal(f"Could not connect or create tables: {err}")
         return False
+
+
+def _create_missing_indexes(inspector: Inspector) -> None:
+    """
+    Create indexes declared on models after their table has been created
+
+    Parameters
+    ----------
+    inspector : Inspector
+        Inspector of the database
+    """
+    for table in Base.metadata.sorted_tables:
+        existing: set[str] = {
+            index["name"]
+            for index in inspector.get_indexes(table.name)
+            if index["name"]
+        }
+        for index in table.indexes:
+            if index.name not in existing:
+                logger.info(f"Creating index {index.name}...")
+                try:
+                    index.create(engine)
+                except Exception as err:
+                    # e.g. a unique index over rows which are not unique yet, the
+                    # duplicates have to be fixed by hand before the next start
+                    logger.error(f"Could not create index {index.name}: {err}")
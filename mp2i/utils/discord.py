@@ -1,5 +1,5 @@
 import logging
-from typing import Any, Callable, List
+from typing import Any, Callable, Coroutine, Dict, Tuple
 
 import discord
 from discord.app_commands import MissingAnyRole, check
@@ -9,6 +9,37 @@ from mp2i.wrappers.guild import GuildWrapper
 logger: logging.Logger = logging.getLogger(__name__)
 
 
+# ids of the roles required by checks, by guild id then by names of the roles
+_required_roles: Dict[int, Dict[Tuple[str, ...], Tuple[int, ...]]] = {}
+
+
+def _required_role_ids(guild: discord.Guild, roles: Tuple[str, ...]) -> Tuple[int, ...]:
+    """
+    Get the ids of the roles required by a check, config file is only read at startup
+
+    Parameters
+    ----------
+    guild : discord.Guild
+        The guild where the check happens
+
+    roles : Tuple[str, ...]
+        Names of the roles in config
+
+    Returns
+    -------
+    Tuple[int, ...]
+        Ids of the required roles
+    """
+    guild_roles: Dict[Tuple[str, ...], Tuple[int, ...]] = _required_roles.setdefault(
+        guild.id, {}
+    )
+    if roles not in guild_roles:
+        guild_roles[roles] = tuple(
+            GuildWrapper(guild, fetch=False).mapping_role_ids(list(roles))
+        )
+    return guild_roles[roles]
+
+
 async def has_any_roles_predicate(
     interaction: discord.Interaction, *roles: str
 ) -> bool:
@@ -34,18 +65,42 @@ async def has_any_roles_predicate(
         logger.warning("Using has_config_role in a non guild context.")
         raise MissingAnyRole(list(roles))
 
-    guild: GuildWrapper = GuildWrapper(interaction.guild, fetch=False)
     member: discord.Member | discord.User = interaction.user
     if isinstance(member, discord.User):
-        logger.error("User is not member in the guild %d.", guild.id)
+        logger.error("User is not member in the guild %d.", interaction.guild.id)
         raise MissingAnyRole(list(roles))
-    needed_role: List[discord.Role] = guild.mapping_roles(list(roles))
-    for role in needed_role:
-        if role in member.roles:
-            return True
+    # Member.get_role is a lookup in the member's sorted role ids, no list is built
+    if any(
+        member.get_role(role_id)
+        for role_id in _required_role_ids(interaction.guild, roles)
+    ):
+        return True
     raise MissingAnyRole(list(roles))
 
 
+def has_any_roles_check(
+    *roles: str,
+) -> Callable[[discord.Interaction], Coroutine[Any, Any, bool]]:
+    """
+    Build once a check for context menus requiring one of the roles
+
+    Parameters
+    ----------
+    roles : tuple[str]
+        Tuple of roles required
+
+    Returns
+    -------
+    Callable[[discord.Interaction], Coroutine[Any, Any, bool]]
+        Predicate to give to add_check
+    """
+
+    async def predicate(interaction: discord.Interaction) -> bool:
+        return await has_any_roles_predicate(interaction, *roles)
+
+    return predicate
+
+
 def has_any_role(*roles: str) -> Callable[[Any], Any]:
     """
     Decorator to control access to specific commands
@@ -61,4 +116,4 @@ def has_any_role(*roles: str) -> Callable[[Any], Any]:
         Predicate
     """
 
-    return check(lambda interaction: has_any_roles_predicate(interaction, *roles))
+    return check(has_any_roles_check(*roles))
@@ -1,7 +1,7 @@
 import logging
 from abc import ABC, abstractmethod
 from datetime import datetime
-from typing import Any, Generic, List, Optional, Tuple, TypeVar
+from typing import Any, Awaitable, Callable, Generic, List, Optional, Tuple, TypeVar
 
 import discord
 import discord.ui as ui
@@ -25,9 +25,15 @@ class Paginator(ABC, Generic[T]):
         entries_per_page: int = 10,
         page: int = 1,
         timestamp: Optional[datetime] = None,
+        fetcher: Optional[Callable[[int, int], Awaitable[List[T]]]] = None,
+        count: Optional[int] = None,
     ) -> None:
         """
         Initialize variables and give timeout to superclass
+
+        When a fetcher is given, entries only hold the current page and the fetcher
+        is called with (offset, limit) to load a page, count being the total number
+        of entries
         """
         super().__init__()
         self.author: int = author
@@ -37,6 +43,8 @@ class Paginator(ABC, Generic[T]):
         self.entries_per_page: int = entries_per_page
         self.page: int = page
         self.timestamp: datetime = timestamp or datetime.now()
+        self.fetcher: Optional[Callable[[int, int], Awaitable[List[T]]]] = fetcher
+        self.count: int = count if count is not None else len(entries)
 
     @abstractmethod
     def create_embeds_and_view(
@@ -95,10 +103,34 @@ class Paginator(ABC, Generic[T]):
         int
             the number of pages
         """
-        if len(self.entries) == 0:
+        if self.count == 0:
             return 1
         # trick to ceil result of an integer division
-        return -(len(self.entries) // -self.entries_per_page)
+        return -(self.count // -self.entries_per_page)
+
+    @property
+    def page_entries(self) -> List[T]:
+        """
+        Get the entries of the current page
+
+        Returns
+        -------
+        List[T]
+            the entries to display
+        """
+        if self.fetcher:
+            return self.entries
+        start: int = (self.page - 1) * self.entries_per_page
+        return self.entries[start : start + self.entries_per_page]
+
+    async def _fetch_page(self) -> None:
+        """
+        Load entries of the current page if they are fetched lazily
+        """
+        if self.fetcher:
+            self.entries = await self.fetcher(
+                (self.page - 1) * self.entries_per_page, self.entries_per_page
+            )
 
     async def _update(self, interaction: discord.Interaction) -> None:
         """
@@ -107,7 +139,8 @@ class Paginator(ABC, Generic[T]):
         embed contents and updates the view buttons' states/labels before editing
         the message.
         """
-        (embed, view) = self.create_embeds_and_view()
+        await self._fetch_page()
+        embed, view = self.create_embeds_and_view()
 
         try:
             await interaction.response.edit_message(
@@ -181,7 +214,8 @@ class Paginator(ABC, Generic[T]):
         interaction : discord.Interaction
             The first interaction by the author, eventually a slashcommand
         """
-        (embed, view) = self.create_embeds_and_view()
+        await self._fetch_page()
+        embed, view = self.create_embeds_and_view()
         if self.max_page_number <= 1:
             await interaction.edit_original_response(
                 embed=embed, view=view, allowed_mentions=discord.AllowedMentions.none()
@@ -208,6 +242,8 @@ class EmbedPaginator(Paginator[str], ui.View):
         entries_per_page: int = 10,
         page: int = 1,
         timestamp: Optional[datetime] = None,
+        fetcher: Optional[Callable[[int, int], Awaitable[List[str]]]] = None,
+        count: Optional[int] = None,
     ) -> None:
         """
         Setting up variables for parent classes
@@ -221,6 +257,8 @@ class EmbedPaginator(Paginator[str], ui.View):
             entries_per_page,
             page,
             timestamp,
+            fetcher,
+            count,
         )
         self.header: str = header
 
@@ -233,12 +271,8 @@ class EmbedPaginator(Paginator[str], ui.View):
         discord.Embed
             Created embed
         """
-        start: int = (self.page - 1) * self.entries_per_page
-        end: int = min(start + self.entries_per_page, len(self.entries))
-
-        description: str = self.header + "\n"
-        for entry in self.entries[start:end]:
-            description += entry + "\n"
+        # single allocation for the whole page
+        description: str = "\n".join([self.header, *self.page_entries]) + "\n"
 
         return discord.Embed(
             title=self.title,
@@ -276,6 +310,8 @@ class ComponentsPaginator(Paginator[ui.Item[Any]], ui.LayoutView):
         entries_per_page: int = 10,
         page: int = 1,
         timestamp: Optional[datetime] = None,
+        fetcher: Optional[Callable[[int, int], Awaitable[List[ui.Item[Any]]]]] = None,
+        count: Optional[int] = None,
     ) -> None:
         """
         Setting up variables for parent classes
@@ -289,6 +325,8 @@ class ComponentsPaginator(Paginator[ui.Item[Any]], ui.LayoutView):
             entries_per_page,
             page,
             timestamp,
+            fetcher,
+            count,
         )
 
     def create_embeds_and_view(
@@ -308,9 +346,7 @@ class ComponentsPaginator(Paginator[ui.Item[Any]], ui.LayoutView):
         container.add_item(ui.TextDisplay(self.title))
         container.add_item(ui.Separator(spacing=discord.SeparatorSpacing.large))
 
-        start: int = (self.page - 1) * self.entries_per_page
-        end: int = min(start + self.entries_per_page, len(self.entries))
-        for entry in self.entries[start:end]:
+        for entry in self.page_entries:
             container.add_item(entry)
 
         if self.max_page_number > 1:
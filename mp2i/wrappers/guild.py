@@ -1,5 +1,6 @@
 import logging
 import sys
+from functools import lru_cache
 from typing import Any, List, Optional, TypeVar
 
 import discord
@@ -17,6 +18,24 @@ logger: logging.Logger = logging.getLogger(__name__)
 T = TypeVar("T")
 
 
+@lru_cache(maxsize=64)
+def _guild_config(guild_id: int) -> dict[str, Any]:
+    """
+    Get the configuration of a guild, config file is only read at startup
+
+    Parameters
+    ----------
+    guild_id : int
+        The id of the guild
+
+    Returns
+    -------
+    dict[str, Any]
+        The configuration of the guild
+    """
+    return get_config_deep(f"guilds.{guild_id}")
+
+
 class GuildWrapper(ObjectWrapper[discord.Guild]):
     """
     Wrap a discord.Guild object to also have its database information
@@ -24,7 +43,7 @@ class GuildWrapper(ObjectWrapper[discord.Guild]):
 
     def __init__(self, guild: discord.Guild, fetch: bool = True) -> None:
         super().__init__(guild)
-        self._config = get_config_deep(f"guilds.{guild.id}")
+        self._config = _guild_config(guild.id)
         if fetch:
             self.__model = self._fetch()
 
@@ -107,6 +126,34 @@ class GuildWrapper(ObjectWrapper[discord.Guild]):
             delete(GuildModel).where(GuildModel.guild_id == self.__model.guild_id)
         )
 
+    def mapping_role_ids(self, roles: List[str]) -> List[int]:
+        """
+        Get the ids of roles from their name in config, without resolving them
+
+        Parameters
+        ----------
+        roles : List[str]
+            Names of the roles in config
+
+        Returns
+        -------
+        List[int]
+            Ids of the roles defined in config
+        """
+        config_roles: dict[str, Any] = self._config.get("roles", {})
+        out: List[int] = []
+        for role in roles:
+            id: Optional[int] = config_roles.get(role, {}).get("id", None)
+            if not id:
+                logger.warning(
+                    "There is no role named %s in config file for guild %d.",
+                    role,
+                    self._boxed.id,
+                )
+                continue
+            out.append(id)
+        return out
+
     def mapping_roles(self, roles: List[str]) -> List[discord.Role]:
         config_roles: dict[str, Any] = self._config.get("roles", {})
         out = []
@@ -21,7 +21,7 @@ class MemberWrapper(ObjectWrapper[discord.Member]):
     Wrap a discord.Member object to have also its database information
     """
 
-    def __init__(self, member: discord.Member) -> None:
+    def __init__(self, member: discord.Member, fetch: bool = True) -> None:
         """
         Getting model if exists in database
 
@@ -29,9 +29,12 @@ class MemberWrapper(ObjectWrapper[discord.Member]):
         ----------
         member : discord.Member
             The member to wrap
+
+        fetch : bool
+            Should the model be fetched from database
         """
         super().__init__(member)
-        self.__model = self._fetch()
+        self.__model: Optional[MemberModel] = self._fetch() if fetch else None
 
     def _fetch(self) -> Optional[MemberModel]:
         """
@@ -181,11 +184,20 @@ class MemberWrapper(ObjectWrapper[discord.Member]):
 
     def message_count_increment(self) -> None:
         """
-        Increment number of messages sent by the member
+        Increment number of messages sent by the member, the model is not needed
         """
-        if not self.__model:
-            return
-        self._update(message_count=self.__model.message_count + 1)
+        # increment server side, no need to read the counter beforehand
+        result: Optional[Result[MemberModel]] = database_executor.execute(
+            update(MemberModel)
+            .where(
+                MemberModel.user_id == self._boxed.id,
+                MemberModel.guild_id == self._boxed.guild.id,
+            )
+            .values(message_count=MemberModel.message_count + 1)
+            .returning(MemberModel)
+        )
+        if result and (member_model := result.scalar_one_or_none()):
+            self.__model = member_model
 
     @property
     def profile_colour(self) -> Optional[int]:
@@ -220,6 +232,25 @@ class MemberWrapper(ObjectWrapper[discord.Member]):
             return []
         return self.__model.promotions
 
+    def promotion_for_school(self, school_id: int) -> Optional[PromotionModel]:
+        """
+        Get the member's promotion in a school
+
+        Parameters
+        ----------
+        school_id : int
+            The school id
+
+        Returns
+        -------
+        Optional[PromotionModel]
+            The first promotion of the member in the school, None if not a member
+        """
+        # promotions are loaded with the member, no need to query them again
+        return next(
+            (prom for prom in self.promotions if prom.school_id == school_id), None
+        )
+
     def __eq__(self, value: Any) -> bool:
         """
         Check if an object is equal to the MemberWrapper